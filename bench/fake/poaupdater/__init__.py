@@ -0,0 +1,7 @@
+"""Stand-in for poaupdater used by the benchmark, talks to bench/mockapi.py
+
+backend is set to mockapi.MockOA by the benchmark, uSysDB and uPackaging
+read its state directly.
+"""
+
+backend = None
@@ -0,0 +1,70 @@
+import xmlrpclib
+
+
+class OpenAPIError(Exception):
+
+    def __init__(self, module_id, extype_id, error_message, properties=None):
+        Exception.__init__(self, error_message)
+        self.module_id = module_id
+        self.extype_id = extype_id
+        self.error_message = error_message
+        self.properties = properties or {}
+
+
+_url = None
+
+
+def initFromEnv(config):
+    global _url
+    _url = config.openapi_url
+
+
+class _Method(object):
+
+    def __init__(self, api, name):
+        self.api = api
+        self.name = name
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _Method(self.api, self.name + '.' + name)
+
+    def __call__(self, **kwargs):
+        return self.api.call(self.name, kwargs)
+
+
+class OpenAPI(object):
+    """XML-RPC client of OpenAPI, calls are made within the request begun last"""
+
+    def __init__(self, url=None):
+        self.server = xmlrpclib.ServerProxy(url or _url, allow_none=True)
+        self.request_id = None
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return _Method(self, name)
+
+    def call(self, name, params):
+        if self.request_id is not None:
+            params = dict(params, request_id=self.request_id)
+        res = getattr(self.server, name)(params)
+        if res['status'] != 0:
+            # failed call aborts the request
+            self.request_id = None
+            raise OpenAPIError(res.get('module_id'), res.get('extype_id'),
+                res.get('error_message'), res.get('properties'))
+        return res.get('result')
+
+    def beginRequest(self):
+        self.request_id = self.call('pem.beginRequest', {})['request_id']
+        return self.request_id
+
+    def commit(self):
+        request_id, self.request_id = self.request_id, None
+        self.call('pem.commitRequest', {'request_id': request_id})
+
+    def rollback(self):
+        request_id, self.request_id = self.request_id, None
+        self.call('pem.rollbackRequest', {'request_id': request_id})
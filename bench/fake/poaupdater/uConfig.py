@@ -0,0 +1,7 @@
+import os
+
+
+class Config(object):
+
+    def __init__(self):
+        self.openapi_url = os.environ.get('OSADT_BENCH_URL', 'http://127.0.0.1:8440/')
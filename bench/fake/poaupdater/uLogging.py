@@ -0,0 +1,2 @@
+log_to_console = True
+logfile = None
@@ -0,0 +1,23 @@
+import poaupdater
+
+
+class ComponentNotFound(Exception):
+    pass
+
+
+def findHostComponentId(host_id, name, ctype):
+    """
+    :returns: (component_id, version)
+    :raises ComponentNotFound: if package is not installed to the host
+    """
+    component_id = poaupdater.backend.find_component(host_id, name)
+    if component_id is None:
+        raise ComponentNotFound("{0} is not installed to host {1}".format(name, host_id))
+    return component_id, '1.0'
+
+
+def findSuitablePackage(host_id, name, ctype):
+    """
+    :returns: (package_id, version)
+    """
+    return poaupdater.backend.find_package(name), '1.0'
@@ -0,0 +1,8 @@
+import poaupdater
+
+
+def connect():
+    """
+    :returns: DB-API connection to the system database of the mock
+    """
+    return poaupdater.backend.db_connect()
@@ -0,0 +1,366 @@
+"""Local stand-in for OA management node: pem.* XML-RPC endpoint and system database
+
+Every API call made within a request (pem.beginRequest .. pem.commitRequest)
+turns into a task which is finished task_time seconds after commit, or
+failed with fail_rate probability. pem.getRequestStatus reports it the same
+way OA does: 0 - done, 1 - in progress, 2 - failed.
+"""
+
+import os
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+import itertools
+import collections
+from SocketServer import ThreadingMixIn
+from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+
+
+# SystemDB.request_status_query for the mock database
+REQUEST_STATUS_QUERY = """SELECT request_id,
+        CASE WHEN done_at > (julianday('now') - 2440587.5) * 86400.0 THEN 1
+            WHEN failed THEN 2 ELSE 0 END
+    FROM requests
+    WHERE request_id IN ({ids})"""
+
+
+class OpenAPIFault(Exception):
+
+    def __init__(self, module_id, extype_id, message, properties=None):
+        Exception.__init__(self, message)
+        self.module_id = module_id
+        self.extype_id = extype_id
+        self.properties = properties or {}
+
+
+class MockOA(object):
+    """State and methods of the mocked management node"""
+
+    def __init__(self, hosts=0, latency=0.0, task_time=0.0, fail_rate=0.0,
+        latencies=None, task_times=None, fail_rates=None, seed=0):
+        """
+        :param hosts: number of hosts registered already
+        :param latency: seconds every call takes
+        :param task_time: seconds from commit till the task is finished
+        :param fail_rate: probability of the task failure
+        :param latencies, task_times, fail_rates: per method overrides, {method: value, ..}
+        """
+        self.latency = latency
+        self.task_time = task_time
+        self.fail_rate = fail_rate
+        self.latencies = latencies or {}
+        self.task_times = task_times or {}
+        self.fail_rates = fail_rates or {}
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.ids = itertools.count(1000)
+        self.calls = collections.Counter()
+        self.requests = {}
+        self.domains = {}
+        self.dns_hosting = set()
+        self.dns_records = set()
+        self.hosts = {}
+        self.attrs = set()
+        self.rts = [{'resource_type_id': next(self.ids),
+            'resource_type_name': 'Branding access points',
+            'resclass_name': 'branding_access_points',
+            'friendly_name': 'Branding access points'}]
+        self.packages = {}
+        self.components = {}
+        fd, self.db_path = tempfile.mkstemp(prefix='osadt-bench-', suffix='.sqlite')
+        os.close(fd)
+        con = self.db_connect()
+        con.executescript("""
+            CREATE TABLE hosts (host_id INTEGER PRIMARY KEY, platform_id INTEGER);
+            CREATE TABLE configured_ips (host_id INTEGER, ip_address TEXT, if_id INTEGER);
+            CREATE TABLE ip_pools (pool_id INTEGER PRIMARY KEY, pool_name TEXT);
+            CREATE TABLE brands (brand_id INTEGER PRIMARY KEY, brand_name TEXT);
+            CREATE TABLE requests (request_id INTEGER PRIMARY KEY, done_at REAL, failed INTEGER);
+            """)
+        for i in range(hosts):
+            self._add_host('172.{0}.{1}.{2}'.format(16 + i // 65536, i // 256 % 256, i % 256),
+                None, 'host{0}.existing.tld'.format(i), con)
+        con.commit()
+        con.close()
+
+    def close(self):
+        os.remove(self.db_path)
+
+    def db_connect(self):
+        return _Connection(sqlite3.connect(self.db_path, check_same_thread=False))
+
+    def _add_host(self, backnet, frontnet, hostname, con=None):
+        host_id = next(self.ids)
+        ips = [ ip for ip in (backnet, frontnet) if ip ]
+        self.hosts[host_id] = {'host_id': host_id, 'primary_name': hostname,
+            'ip_addresses': [ {'ip_address': ip} for ip in ips ]}
+        own_con = con is None
+        if own_con:
+            con = self.db_connect()
+        con.cursor().execute("INSERT INTO hosts VALUES (%s, %s)", (host_id, 1))
+        for if_id, ip in enumerate(ips, start=1):
+            # the database keeps octets zero padded
+            ip0 = '.'.join(o.zfill(3) for o in ip.split('.'))
+            con.cursor().execute("INSERT INTO configured_ips VALUES (%s, %s, %s)",
+                (host_id, ip0, host_id * 10 + if_id))
+        if own_con:
+            con.commit()
+            con.close()
+        return host_id
+
+    def find_package(self, name):
+        with self.lock:
+            return self.packages.setdefault(name, next(self.ids))
+
+    def find_component(self, host_id, name):
+        with self.lock:
+            return self.components.get((host_id, self.packages.get(name)))
+
+    def dispatch(self, method, params):
+        """Run the method
+
+        :returns: OpenAPI response struct
+        """
+        with self.lock:
+            self.calls[method] += 1
+        time.sleep(self.latencies.get(method, self.latency))
+        handler = getattr(self, method.replace('.', '_'), None)
+        if handler is None:
+            return {'status': -1, 'module_id': 'OpenAPI', 'extype_id': 1,
+                'error_message': 'Unknown method ' + method}
+        params = dict(params)
+        request_id = params.pop('request_id', None)
+        try:
+            with self.lock:
+                if method in ('pem.commitRequest', 'pem.rollbackRequest',
+                    'pem.getRequestStatus'):
+                    params['request_id'] = request_id
+                elif request_id is not None:
+                    self.requests[request_id]['method'] = method
+                result = handler(**params)
+        except OpenAPIFault as err:
+            return {'status': -1, 'module_id': err.module_id, 'extype_id': err.extype_id,
+                'error_message': str(err), 'properties': err.properties}
+        return {'status': 0, 'result': result}
+
+    # requests
+
+    def pem_beginRequest(self):
+        request_id = next(self.ids)
+        self.requests[request_id] = {'method': None, 'done_at': None, 'failed': False}
+        return {'request_id': request_id}
+
+    def pem_commitRequest(self, request_id):
+        request = self.requests[request_id]
+        method = request['method']
+        request['done_at'] = time.time() + self.task_times.get(method, self.task_time)
+        request['failed'] = self.random.random() < self.fail_rates.get(method, self.fail_rate)
+        con = self.db_connect()
+        con.cursor().execute("INSERT INTO requests VALUES (%s, %s, %s)",
+            (request_id, request['done_at'], request['failed']))
+        con.commit()
+        con.close()
+        return {}
+
+    def pem_rollbackRequest(self, request_id):
+        self.requests.pop(request_id, None)
+        return {}
+
+    def pem_getRequestStatus(self, request_id):
+        request = self.requests[request_id]
+        if request['done_at'] is None or request['done_at'] > time.time():
+            return {'request_status': 1}
+        return {'request_status': 2 if request['failed'] else 0}
+
+    # methods used by OSA
+
+    def pem_uploadLicense(self, license):
+        return {}
+
+    def pem_getDomainByName(self, domain_name):
+        if domain_name not in self.domains:
+            raise OpenAPIFault('dns', 10, "Domain {0} not found".format(domain_name))
+        return self.domains[domain_name]
+
+    def pem_addDomainToAccount(self, account_id, domain_name):
+        domain_id = next(self.ids)
+        self.domains[domain_name] = {'domain_id': domain_id, 'owner_id': account_id}
+        return {'domain_id': domain_id}
+
+    def pem_getSubscription(self, subscription_id, get_resources=False):
+        return {'subscription_id': subscription_id, 'owner_id': 1}
+
+    def pem_addSubdomain(self, subscription_id, domain_name, prefix):
+        self.pem_getDomainByName(domain_name)
+        return self.pem_addDomainToAccount(1, prefix + '.' + domain_name)
+
+    def pem_registerSharedNode(self, host, login, password, network_config,
+        new_hostname=None, role=None, role_params=None):
+        for h in self.hosts.values():
+            if host in [ ip['ip_address'] for ip in h['ip_addresses'] ]:
+                raise OpenAPIFault('SharedNodeRegistrator', 13,
+                    "Host {0} is registered already".format(host))
+        shared_ip = network_config.get('shared_ip')
+        host_id = self._add_host(host, shared_ip if shared_ip != host else None,
+            new_hostname or 'node{0}.tld'.format(len(self.hosts)))
+        return {'host_id': host_id}
+
+    def pem_getHosts(self, ip_address=None):
+        if ip_address is None:
+            return list(self.hosts.values())
+        return [ h for h in self.hosts.values()
+            if ip_address in [ ip['ip_address'] for ip in h['ip_addresses'] ] ]
+
+    def pem_setHostAttributes(self, host_id, attr):
+        return {}
+
+    def pem_setHostReadyToProvide(self, host_id, ready_to_provide):
+        return {}
+
+    def pem_getProvisioningAttributes(self):
+        return [ {'name': name, 'descr': ''} for name in sorted(self.attrs) ]
+
+    def pem_addProvisioningAttributes(self, attrs):
+        self.attrs.update(a['name'] for a in attrs)
+        return {}
+
+    def pem_getResourceTypesByClass(self, resclass_name=None, friendly_name=None,
+        show_system_rt=False):
+        return [ dict(rt) for rt in self.rts
+            if rt['resclass_name'] == resclass_name or rt['friendly_name'] == friendly_name ]
+
+    def pem_addResourceType(self, resclass_name, name, attrs=None, act_params=None):
+        rt_id = next(self.ids)
+        self.rts.append({'resource_type_id': rt_id, 'resource_type_name': name,
+            'resclass_name': resclass_name, 'friendly_name': resclass_name})
+        return {'resource_type_id': rt_id}
+
+    def pem_setRTAttributes(self, rt_id, attr):
+        return {}
+
+    def pem_createDNSHostingConfiguration(self, **params):
+        return next(self.ids)
+
+    def pem_addDNSHosting(self, domain_id, hosting_rt_id):
+        if domain_id in self.dns_hosting:
+            raise OpenAPIFault('dns', 2040, "DNS hosting is added already")
+        self.dns_hosting.add(domain_id)
+        return {}
+
+    def pem_createDNSRecord(self, domain_name, host, type, data):
+        if (domain_name, host, type, data) in self.dns_records:
+            raise OpenAPIFault('dns', 2061, "Record exists")
+        self.dns_records.add((domain_name, host, type, data))
+        return {'record_id': next(self.ids)}
+
+    def pem_packaging_installPackageSync(self, host_id, package_id, properties=None):
+        component_id = next(self.ids)
+        self.components[(host_id, package_id)] = component_id
+        return {'component_id': component_id}
+
+    def pem_packaging_installPackageByName(self, host_id, pname, ptype):
+        return self.pem_packaging_installPackageSync(host_id, self.find_package(pname))
+
+    def pem_createIPPool(self, name, startIP, endIP, netmask, purpose):
+        con = self.db_connect()
+        cur = con.cursor()
+        cur.execute("INSERT INTO ip_pools (pool_name) VALUES (%s)", (name,))
+        pool_id = cur.lastrowid
+        con.commit()
+        con.close()
+        return {'pool_id': pool_id}
+
+    def pem_bindIPPool(self, pool_id, interface_id):
+        return {}
+
+    def pem_brandDomain(self, domain_name, ip_type):
+        con = self.db_connect()
+        cur = con.cursor()
+        cur.execute("INSERT INTO brands (brand_name) VALUES (%s)", (domain_name,))
+        brand_id = cur.lastrowid
+        con.commit()
+        con.close()
+        return brand_id
+
+    def pem_getVendorBrands(self, account_id):
+        con = self.db_connect()
+        cur = con.cursor()
+        cur.execute("SELECT brand_id, brand_name FROM brands")
+        brands = [ {'brand_id': b, 'domain_name': n} for b, n in cur.fetchall() ]
+        con.close()
+        return brands
+
+
+class _Connection(object):
+    """sqlite connection accepting uSysDB (%s) query parameters"""
+
+    def __init__(self, con):
+        self.con = con
+
+    def cursor(self):
+        return _Cursor(self.con.cursor())
+
+    def executescript(self, script):
+        self.con.executescript(script)
+
+    def commit(self):
+        self.con.commit()
+
+    def rollback(self):
+        self.con.rollback()
+
+    def close(self):
+        self.con.close()
+
+
+class _Cursor(object):
+
+    def __init__(self, cur):
+        self.cur = cur
+
+    def execute(self, sql, params=()):
+        self.cur.execute(sql.replace('%s', '?'), params)
+
+    @property
+    def lastrowid(self):
+        return self.cur.lastrowid
+
+    def fetchall(self):
+        return self.cur.fetchall()
+
+
+class _RequestHandler(SimpleXMLRPCRequestHandler):
+    # keep-alive connections
+    protocol_version = 'HTTP/1.1'
+
+
+class _Server(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+def serve(backend, host='127.0.0.1', port=0):
+    """Start XML-RPC server in background thread
+
+    :returns: (server, url)
+    """
+    server = _Server((host, port), _RequestHandler, logRequests=False, allow_none=True)
+    server.register_instance(_Dispatcher(backend))
+    thread = threading.Thread(target=server.serve_forever, name='MockOA')
+    thread.daemon = True
+    thread.start()
+    return server, 'http://{0}:{1}/'.format(*server.server_address)
+
+
+class _Dispatcher(object):
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _dispatch(self, method, params):
+        if method == 'system.multicall':
+            with self.backend.lock:
+                self.backend.calls[method] += 1
+            return [ [self._dispatch(call['methodName'], call['params'])] for call in params[0] ]
+        return self.backend.dispatch(method, params[0] if params else {})
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+"""
+
+Benchmark of osadt.py deployment flow against a local mock of OA management node.
+
+For every fleet size osadt.py is run with generated configuration against
+bench/mockapi.py (pem.* XML-RPC endpoint and system database), the wall clock
+time and the number of API calls are printed.
+
+Example:
+    python bench/run.py --ns 1,10,100 --hosts 5000 --latency 0.01 --task-time 0.5 \
+        --task-time-of pem.registerSharedNode=5 --fail-rate-of pem.addDNSHosting=0.1
+
+"""
+
+import os
+import sys
+import time
+import tempfile
+import optparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCH_DIR, 'fake'), os.path.dirname(BENCH_DIR)]
+
+import poaupdater
+import osadt
+import mockapi
+
+SCRIPT = os.path.join(os.path.dirname(BENCH_DIR), 'osadt.py')
+CONFIG_END = '############## CONFIGURATION END #################'
+
+
+def make_config(ns_count, workers, licfile, trace_file, keep_alive=True, poll_db=False):
+    """
+    :returns: source of osadt.py CONFIGURATION section
+    """
+    def ip(net, i):
+        return '10.{0}.{1}.{2}'.format(net, i // 256, i % 256 + 1)
+
+    nodes = {
+        'linpps': {'frontnet': ip(100, 1), 'backnet': ip(0, 1)},
+        'linpgh': {'frontnet': ip(100, 2), 'backnet': ip(0, 2)},
+        'nses': [ {'hostname': 'ns{0}.prov.tld'.format(i), 'frontnet': ip(101, i),
+            'backnet': ip(1, i)} for i in range(ns_count) ],
+        'ui': {'frontnet': ip(100, 3), 'backnet': ip(0, 3)},
+        'ba': {
+            'db': {'backnet': ip(0, 4)},
+            'app': {'hostname': 'ba.prov.tld', 'frontnet': ip(100, 5), 'backnet': ip(0, 5)},
+            'store': {'hostname': 'store.prov.tld', 'frontnet': ip(100, 6), 'backnet': ip(0, 6)},
+        }
+    }
+    config = {
+        'licfile': licfile,
+        'provdomain': 'prov.tld',
+        'cp_password': 'secret',
+        'brand_attr': 'branding',
+        'linpgh_attr': 'External Provisioning',
+        'cp_prefix': 'cp',
+        'login': 'root',
+        'password': 'secret',
+        'nodes': nodes,
+        'install_updates_cmd': 'true',
+        'command_timeout': 60,
+        'command_retries': 0,
+        'command_on_failure': 'abort',
+        'workers': workers,
+        'plan_only': False,
+        'trace_file': trace_file,
+        'keep_alive': keep_alive,
+        'poll_db': poll_db,
+        'request_status_query': mockapi.REQUEST_STATUS_QUERY if poll_db else None,
+        # nodes of the mock do not exist
+        'preflight': False,
+        'domains_file': None,
+        # every run starts with an empty mock
+        'resume': False,
+        'adaptive_timeouts': True,
+        'timeout_overrides': {},
+        'api_limits': {'pem.registerSharedNode': 4, 'pem.packaging.installPackageSync': 8},
+        'api_rates': {},
+        'cache_dir': os.path.join(os.path.dirname(trace_file), 'cache'),
+        'json_log': os.path.join(os.path.dirname(trace_file), 'osadt.log.jsonl'),
+    }
+    return ''.join("{0} = {1!r}\n".format(name, value) for name, value in sorted(config.items()))
+
+
+def run(ns_count, options, licfile, trace_file):
+    """Run osadt.py against fresh mock
+
+    :returns: (seconds, {method: number of calls, ..}, error or None)
+    """
+    backend = mockapi.MockOA(hosts=options.hosts, latency=options.latency,
+        task_time=options.task_time, fail_rate=options.fail_rate,
+        latencies=options.latency_of, task_times=options.task_time_of,
+        fail_rates=options.fail_rate_of)
+    server, url = mockapi.serve(backend)
+    os.environ['OSADT_BENCH_URL'] = url
+    poaupdater.backend = backend
+    osadt.tracing.tracer = osadt.Tracer()
+    with open(SCRIPT) as f:
+        source = f.read()
+    source = (make_config(ns_count, options.workers, licfile, trace_file,
+        not options.no_keep_alive, options.poll_db) +
+        source[source.index(CONFIG_END):])
+    stdout = sys.stdout
+    if options.quiet:
+        sys.stdout = open(os.devnull, 'w')
+    start = time.time()
+    error = None
+    try:
+        exec(compile(source, SCRIPT, 'exec'), {'__name__': '__main__'})
+    except osadt.OSAError as err:
+        error = err
+    finally:
+        sys.stdout = stdout
+        server.shutdown()
+        server.server_close()
+        backend.close()
+    return time.time() - start, backend.calls, error
+
+
+def per_method(values):
+    """
+    :param values: ['METHOD=VALUE', ..]
+    :returns: {method: float value, ..}
+    :raises ValueError: on wrong value
+    """
+    result = {}
+    for value in values or []:
+        method, sep, number = value.partition('=')
+        try:
+            result[method] = float(number)
+        except ValueError:
+            raise ValueError("METHOD=VALUE expected, got " + value)
+    return result
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option('--ns', default='1,10,100',
+        help="comma separated numbers of NS nodes, one run per number [%default]")
+    parser.add_option('--hosts', type='int', default=5000,
+        help="number of hosts registered already [%default]")
+    parser.add_option('--latency', type='float', default=0.01,
+        help="seconds every API call takes [%default]")
+    parser.add_option('--task-time', type='float', default=0.5,
+        help="seconds from request commit till its task is done [%default]")
+    parser.add_option('--fail-rate', type='float', default=0.0,
+        help="probability of task failure [%default]")
+    parser.add_option('--latency-of', action='append', metavar='METHOD=S',
+        help="seconds calls of the method take, repeatable")
+    parser.add_option('--task-time-of', action='append', metavar='METHOD=S',
+        help="seconds tasks of the method take, repeatable")
+    parser.add_option('--fail-rate-of', action='append', metavar='METHOD=P',
+        help="probability of failure of the method tasks, repeatable")
+    parser.add_option('--workers', type='int', default=8,
+        help="osadt.py workers [%default]")
+    parser.add_option('--no-keep-alive', action='store_true',
+        help="open new HTTP connection for every API call")
+    parser.add_option('--poll-db', action='store_true',
+        help="check request statuses in the mock database instead of API")
+    parser.add_option('-q', '--quiet', action='store_true', help="hide osadt.py output")
+    options, args = parser.parse_args()
+    try:
+        for name in ('latency_of', 'task_time_of', 'fail_rate_of'):
+            setattr(options, name, per_method(getattr(options, name)))
+    except ValueError as err:
+        parser.error(str(err))
+    # the mock does not run the installer and HCL, commands only have to succeed
+    osadt.OSA.install_hcl_cmd = 'true'
+    tmpdir = tempfile.mkdtemp(prefix='osadt-bench-')
+    licfile = os.path.join(tmpdir, 'license.xml')
+    with open(licfile, 'w') as f:
+        f.write('<license/>')
+    results = []
+    for ns_count in [ int(n) for n in options.ns.split(',') ]:
+        trace_file = os.path.join(tmpdir, 'trace-ns{0}.json'.format(ns_count))
+        seconds, calls, error = run(ns_count, options, licfile, trace_file)
+        results.append((ns_count, seconds, calls, error, trace_file))
+    print("{0:>6} {1:>7} {2:>9} {3:>9} {4:>9} {5:>7}  {6}".format(
+        'ns', 'hosts', 'wall,s', 'calls', 'polls', 'result', 'trace'))
+    for ns_count, seconds, calls, error, trace_file in results:
+        print("{0:>6} {1:>7} {2:>9.2f} {3:>9} {4:>9} {5:>7}  {6}".format(ns_count,
+            options.hosts, seconds, sum(calls.values()), calls['pem.getRequestStatus'],
+            'failed' if error else 'ok', trace_file))
+    for ns_count, seconds, calls, error, trace_file in results:
+        if error:
+            print("ns {0}: {1}".format(ns_count, error))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,8 @@ Prerequisites:
 0. It works only on LINMN
 
 Modify options in CONFIGURATION section.
+Or set them in a configuration file and run 'python -m osadt -c FILE deploy',
+see 'python -m osadt --help' for other commands.
 
 In some specific cases you might need to adjust the code itself.
 
@@ -57,101 +59,74 @@ nodes = {
     }
 }
 
+# provider domains and subdomains to add in bulk, CSV or JSON lines, see osadt/onboarding.py;
+# results are appended to domains_file + '.results', done ones are skipped on the next run
+domains_file = None
+
 install_updates_cmd = "/usr/local/pem/bin/pa_updates_installer --install"
 
+# failed commands (updates installer, HCL) are retried, then deployment is aborted;
+# set command_on_failure = 'ask' to be prompted for retry/abort/ignore
+command_timeout = 3600
+command_retries = 2
+command_on_failure = 'abort'
+
+# number of deployment steps (e.g. node registrations) run at once, 1 to run them one by one
+workers = 8
+
+# only print which steps are not done yet, do not run them
+plan_only = False
+
+# timing of every API call, database query and command, open in chrome://tracing;
+# None to not export it
+trace_file = 'osadt.trace.json'
+
+# check reachability and SSH login of nodes not registered yet before deployment,
+# SSH login is checked with paramiko, without it only a warning is printed
+preflight = True
+
+# max requests of a method running at once on the management node and calls of it per second,
+# e.g. {'pem.registerSharedNode': 4, '*': 32},
+# rates {'pem.addDNSHosting': (2, 5)} - 2 per second, bursts of 5
+api_limits = {'pem.registerSharedNode': 4, 'pem.packaging.installPackageSync': 8}
+api_rates = {}
+
+# check statuses of all running requests with one system database query instead of
+# one API call per request; the query is not provided as the schema differs between
+# OA versions, it returns (request_id, status) rows with statuses of pem.getRequestStatus,
+# see SystemDB.request_status_query in osadt/db.py
+poll_db = False
+request_status_query = None
+
+# timeouts of requests follow their durations in previous runs, kept in cache_dir/durations.json;
+# fixed timeouts for some methods, e.g. {'pem.registerSharedNode': 1800}
+adaptive_timeouts = True
+timeout_overrides = {}
+
+# keep HTTP connection to OpenAPI open between calls
+keep_alive = True
+
+# log of OA updater library, appended, rotated at 10M
+log_file = 'poaupdater.log'
+
+# steps, API calls, requests and command output as JSON lines, rotated at json_log_max_bytes
+json_log = 'osadt.log.jsonl'
+json_log_max_bytes = 10 * 1024 * 1024
+json_log_backups = 5
+
+# local state kept between runs, e.g. downloaded license
+cache_dir = '.osadt'
+
+# skip steps finished by previous runs with the same configuration, they are recorded
+# in cache_dir/journal.jsonl; remove the file to verify all steps against OA again
+resume = True
+
 ############## CONFIGURATION END #################
 
 
-from osadt import OSA
-osa = OSA(cp_password=cp_password)
-
-# install license
-if 'licfile' in globals():
-    print("Installing license from file " + licfile)
-    osa.upload_license(filename=licfile)
-else:
-    print("Installing license from URL " + licurl)
-    osa.upload_license(url=licurl)
-
-# install OSA updates
-print("Installing avalible updates")
-osa.install_updates(install_updates_cmd)
-
-# add provider's domain
-print("Creating provider's domain")
-domain_id = osa.add_provider_domain(provdomain)
-
-# privacy proxy
-node = nodes.get('linpps')
-if node:
-    print("Adding privacy proxy " + node['backnet'])
-    osa.register_linpps(node['backnet'], login, password, node['frontnet'])
-
-# linpgh
-node = nodes.get('linpgh')
-if node:
-    print("Adding Linux provisioning getaway " + node['backnet'])
-    osa.create_attrs(linpgh_attr)
-    node_id = osa.register_shared_node(node['backnet'], login, password, node['frontnet'])
-    osa.set_host_attrs(node_id, linpgh_attr)
-    osa.set_host_ready(node_id)
- 
-# nses
-nses = nodes.get('nses')
-if nses:
-    ns_hostnames = [node['hostname'] for node in nses]
-    for node in nses:
-        print("Adding DNS server " + node['backnet'])
-        osa.register_dns(node['backnet'], login, password, node['frontnet'],
-            new_hostname=node.get('hostname'))
-    osa.create_dns_rt(*ns_hostnames)
-    osa.add_dns_hosting(provdomain)
-    # add A records
-    for node in nses:
-        ns_hostname = node['hostname']
-        ns_fip = node['frontnet']
-        # subdomain of provdomain?
-        if ns_hostname.endswith('.' + provdomain):
-            prefix = ns_hostname[:-len(provdomain)-1]
-            osa.add_dns_record(provdomain, prefix, 'A', ns_fip)
- 
-# UI host
-node = nodes.get('ui')
-if node:
-    print("Adding UI server " + node['backnet'])
-    branding_host_id = osa.register_ui(node['backnet'], login, password, node['frontnet'])
-    # osa.add_ui(branding_host_id)
-    osa.create_attrs(brand_attr)
-    osa.set_host_attrs(branding_host_id, brand_attr)
-    osa.set_host_ready(branding_host_id)
-    # configure RTs for branding
-    bap_rt_id = osa.get_rt_id('Branding access points', 'Branding access points')
-    osa.set_rt_attrs(bap_rt_id, brand_attr)
-    # brand_web_rt_id = osa.create_brand_web_rt(provdomain, brand_attr=brand_attr)
-    if 'cp_domain' in globals():
-        osa.add_provider_domain(cp_domain)
-    else:
-        cp_domain = cp_prefix + '.' + provdomain
-        osa.add_provider_subdomain(provdomain, cp_prefix)
-    has_exclusive_ip = 'cp_ip' in globals()
-    if has_exclusive_ip:
-        # create branding ip pool
-        pool_id = osa.create_ip_pool(cp_domain, cp_ip, cp_ip, cp_ipnetmask,
-            ['COMMON.BRANDING', 'SHARED.HOSTING'])
-        osa.bind_ip_pool(branding_host_id, node['frontnet'], pool_id)
-    osa.create_prov_brand(cp_domain, has_exclusive_ip)
- 
-######## BA deployment
-ba = nodes.get('ba')
-if ba:
-    print("Adding BA Database server " + ba['db']['backnet'])
-    osa.register_badb(ba['db']['backnet'], login, password, ba['app']['backnet'])
-    print("Adding BA Application server " + ba['app']['backnet'])
-    osa.register_baapp(ba['app']['backnet'], login, password, ba['app']['frontnet'],
-        ba['app']['hostname'])
-    print("Adding BA Store server " + ba['store']['backnet'])
-    osa.register_store(ba['store']['backnet'], login, password, ba['store']['frontnet'],
-        ba['store'].get('hostname')) 
+# the same flow is run by 'python -m osadt deploy' with these options in a configuration file
+from osadt.flow import run, from_globals
+run(from_globals(globals()))
 
 
 
@@ -1 +1,17 @@
 from osa import OSA
+from cache import DomainCache, HostInventory, ResourceTypeCatalog
+from db import ConnectionPool, SystemDB
+from errors import OSAError
+from futures import Future, gather
+from governor import Governor, TokenBucket
+from journal import Journal
+from licenses import LicenseCache
+from onboarding import Onboarding
+from plan import Snapshot
+from preflight import Preflight
+from runner import CommandRunner
+from steps import Deployment, Step
+from timeouts import AdaptiveTimeouts
+from tracker import RequestTracker
+from tracing import Tracer
+from transport import KeepAliveTransport, install_keep_alive
@@ -0,0 +1,5 @@
+import sys
+
+from osadt.cli import main
+
+sys.exit(main())
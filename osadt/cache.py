@@ -0,0 +1,273 @@
+import time
+import threading
+
+from futures import Future
+
+
+class HostInventory(object):
+    """Index of hosts by IP address and hostname
+
+    The index is built from the full pem.getHosts list once and rebuilt when
+    it is older than ttl. IP addresses missing from the index are looked up
+    one by one and added to it.
+    """
+
+    ttl = 600
+
+    def __init__(self, get_hosts, ttl=None):
+        """
+        :param get_hosts: callable(**filter) returning pem.getHosts response
+        """
+        self.get_hosts = get_hosts
+        self.ttl = ttl or self.ttl
+        self.lock = threading.RLock()
+        self.by_ip = {}
+        self.by_name = {}
+        self.loaded = None
+
+    def invalidate(self):
+        with self.lock:
+            self.by_ip = {}
+            self.by_name = {}
+            self.loaded = None
+
+    def refresh(self):
+        """Rebuild index from the full host list"""
+        hosts = self.get_hosts()
+        with self.lock:
+            self.by_ip = {}
+            self.by_name = {}
+            for host in hosts:
+                self._index(host)
+            self.loaded = time.time()
+
+    def _index(self, host):
+        host_id = host['host_id']
+        for ip in host.get('ip_addresses', []):
+            self.by_ip[ip['ip_address']] = host_id
+        name = host.get('primary_name') or host.get('hostname')
+        if name:
+            self.by_name[name] = host_id
+
+    def _fresh(self):
+        with self.lock:
+            if self.loaded is None or time.time() - self.loaded > self.ttl:
+                self.refresh()
+
+    def add(self, host_id, ips=(), name=None):
+        """Add host to the index, e.g. right after its registration"""
+        with self.lock:
+            for ip in ips:
+                if ip:
+                    self.by_ip[ip] = host_id
+            if name:
+                self.by_name[name] = host_id
+
+    def get_by_ip(self, ip):
+        """
+        :returns: host_id or None
+        """
+        self._fresh()
+        with self.lock:
+            if ip in self.by_ip:
+                return self.by_ip[ip]
+        for host in self.get_hosts(ip_address=ip):
+            with self.lock:
+                self._index(host)
+        with self.lock:
+            return self.by_ip.get(ip)
+
+    def get_by_name(self, name):
+        """
+        :returns: host_id or None
+        """
+        self._fresh()
+        with self.lock:
+            return self.by_name.get(name)
+
+
+class ResourceTypeCatalog(object):
+    """Resource types by class and name
+
+    All resource types of a class are loaded at once on the first lookup in the
+    class, first by class name and, if the name is not found there, by class
+    friendly name - the same way OSA.get_rt_id() searched them.
+    """
+
+    def __init__(self, get_rts):
+        """
+        :param get_rts: callable(**filter) returning pem.getResourceTypesByClass response
+        """
+        self.get_rts = get_rts
+        self.lock = threading.RLock()
+        self.rts = {}
+        self.loaded = set()
+
+    def invalidate(self, rt_class=None):
+        with self.lock:
+            if rt_class is None:
+                self.rts = {}
+                self.loaded = set()
+            else:
+                self.rts.pop(rt_class, None)
+                self.loaded.discard((rt_class, 'resclass_name'))
+                self.loaded.discard((rt_class, 'friendly_name'))
+
+    def _load(self, rt_class, by):
+        if (rt_class, by) in self.loaded:
+            return
+        rts = self.rts.setdefault(rt_class, {})
+        for rt in self.get_rts(**{by: rt_class}):
+            # the first found wins
+            rts.setdefault(rt['resource_type_name'], rt['resource_type_id'])
+        self.loaded.add((rt_class, by))
+
+    def load(self, rt_class):
+        """Load all resource types of the class by class name and friendly name"""
+        with self.lock:
+            for by in ('resclass_name', 'friendly_name'):
+                self._load(rt_class, by)
+
+    def add(self, rt_name, rt_class, rt_id):
+        """Add resource type, e.g. right after its creation"""
+        with self.lock:
+            self.rts.setdefault(rt_class, {})[rt_name] = rt_id
+
+    def get(self, rt_name, rt_class):
+        """
+        :param rt_class: class name or friendly name
+        :returns: rt_id or None
+        """
+        with self.lock:
+            for by in ('resclass_name', 'friendly_name'):
+                if rt_name in self.rts.get(rt_class, {}):
+                    break
+                self._load(rt_class, by)
+            return self.rts[rt_class].get(rt_name)
+
+
+class DomainCache(object):
+    """Domains by name: (domain_id, owner_id)
+
+    Missing domains are remembered as (None, None) for negative_ttl seconds.
+    Concurrent lookups of the same name wait for one API call.
+    """
+
+    negative_ttl = 60
+
+    def __init__(self, get_domain, get_domains=None, negative_ttl=None):
+        """
+        :param get_domain: callable(name) returning (domain_id, owner_id),
+            (None, None) if there is no such domain
+        :param get_domains: callable([name, ..]) returning {name: (domain_id, owner_id), ..},
+            looks names up one by one with get_domain if not set
+        """
+        self.get_domain = get_domain
+        self.get_domains = get_domains
+        if negative_ttl is not None:
+            self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.domains = {}
+        # missing domain name: time it was looked up
+        self.missing = {}
+        # name: Future of the lookup in progress
+        self.pending = {}
+
+    def invalidate(self, name=None):
+        with self.lock:
+            if name is None:
+                self.domains = {}
+                self.missing = {}
+            else:
+                self.domains.pop(name, None)
+                self.missing.pop(name, None)
+
+    def add(self, name, domain_id, owner_id):
+        """Add domain, e.g. right after its creation"""
+        with self.lock:
+            self.domains[name] = (domain_id, owner_id)
+            self.missing.pop(name, None)
+
+    def _cached(self, name):
+        """
+        :returns: (domain_id, owner_id) or None if not known, call with lock held
+        """
+        if name in self.domains:
+            return self.domains[name]
+        if name in self.missing:
+            if time.time() - self.missing[name] <= self.negative_ttl:
+                return (None, None)
+            del self.missing[name]
+        return None
+
+    def _store(self, name, domain):
+        if domain[0] is None:
+            self.missing[name] = time.time()
+        else:
+            self.domains[name] = domain
+
+    def _claim(self, names):
+        """Split names into cached, looked up by others and to be looked up by caller
+
+        :returns: ({name: domain, ..}, {name: Future, ..}, {name: Future, ..})
+        """
+        cached, waiting, own = {}, {}, {}
+        with self.lock:
+            for name in names:
+                domain = self._cached(name)
+                if domain is not None:
+                    cached[name] = domain
+                elif name in self.pending:
+                    waiting[name] = self.pending[name]
+                elif name not in own:
+                    own[name] = self.pending[name] = Future("lookup of domain " + name)
+        return cached, waiting, own
+
+    def _resolve(self, own, domains=None, error=None):
+        with self.lock:
+            for name in own:
+                if error is None:
+                    self._store(name, domains[name])
+                del self.pending[name]
+        for name, future in own.items():
+            if error is None:
+                future.set_result(domains[name])
+            else:
+                future.set_exception(error)
+
+    def get(self, name):
+        """
+        :returns: (domain_id, owner_id), (None, None) if there is no such domain
+        """
+        cached, waiting, own = self._claim([name])
+        if name in cached:
+            return cached[name]
+        if name in waiting:
+            return waiting[name].result()
+        try:
+            domain = self.get_domain(name)
+        except Exception as err:
+            self._resolve(own, error=err)
+            raise
+        self._resolve(own, {name: domain})
+        return domain
+
+    def get_many(self, names):
+        """Look up all names not known yet together
+
+        :returns: {name: (domain_id, owner_id), ..}
+        """
+        if self.get_domains is None:
+            return dict( (name, self.get(name)) for name in names )
+        cached, waiting, own = self._claim(names)
+        if own:
+            try:
+                domains = self.get_domains(list(own))
+            except Exception as err:
+                self._resolve(own, error=err)
+                raise
+            self._resolve(own, domains)
+            cached.update( (name, domains[name]) for name in own )
+        for name, future in waiting.items():
+            cached[name] = future.result()
+        return cached
@@ -0,0 +1,156 @@
+"""osadt command
+
+    python -m osadt [-c osadt.conf] COMMAND [options]
+
+Configuration file is Python code setting the options of osadt.py
+CONFIGURATION section, see flow.DEFAULTS. OpenAPI is connected only by
+commands which need it.
+"""
+
+import os
+import sys
+import argparse
+
+from errors import OSAError
+import flow
+
+DEFAULT_CONFIG = 'osadt.conf'
+
+
+def cmd_deploy(config, args):
+    flow.run(config)
+
+
+def cmd_plan(config, args):
+    config['plan_only'] = True
+    flow.run(config)
+
+
+def cmd_check_nodes(config, args):
+    flow.check_config(config, 'login', 'password')
+    checks = flow.node_checks(config)
+    if not checks.nodes:
+        print("No nodes configured")
+    elif not flow.check_nodes(checks):
+        raise OSAError("Nodes check failed")
+
+
+def cmd_register_node(config, args):
+    flow.check_config(config, 'login', 'password')
+    osa = flow.make_osa(config)
+    host_id = osa.register_node(backnet=args.backnet, login=config['login'],
+        password=config['password'], frontnet=args.frontnet, new_hostname=args.hostname,
+        attrs=args.attr, ready=args.ready)
+    print(host_id)
+
+
+def cmd_configure_hosts(config, args):
+    osa = flow.make_osa(config)
+    results = osa.configure_hosts(args.hosts, args.attr, ready=args.ready,
+        workers=config['workers'])
+    for r in results:
+        print("{0}\t{1}\t{2}".format(r['host'], r['host_id'] or '-',
+            r['status'] if r['error'] is None else "failed: {0}".format(r['error'])))
+    failed = [ r for r in results if r['status'] == 'failed' ]
+    if failed:
+        raise OSAError("Failed to configure {0} hosts".format(len(failed)))
+
+
+def cmd_add_dns(config, args):
+    osa = flow.make_osa(config)
+    records = [ (args.domain, args.host, args.type, data) for data in args.data ]
+    results = osa.add_dns_records(records)
+    for r in results:
+        print("{host}.{domain} {type} {data}\t{status}".format(**r) +
+            (": {0}".format(r['error']) if r['error'] else ""))
+    if [ r for r in results if r['status'] == 'failed' ]:
+        raise OSAError("Failed to add DNS records")
+
+
+def cmd_add_domains(config, args):
+    osa = flow.make_osa(config)
+    counts = flow.onboard(osa, args.file, config['workers'])
+    if counts['failed']:
+        raise OSAError("Failed to add {0} domains, see {1}.results".format(
+            counts['failed'], args.file))
+
+
+def cmd_config(config, args):
+    for name in sorted(config):
+        value = config[name]
+        if name in ('password', 'cp_password') and value:
+            value = '***'
+        print("{0} = {1!r}".format(name, value))
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='osadt', description="OSA deployment tool")
+    parser.add_argument('-c', '--config',
+        help="configuration file [{0} if exists]".format(DEFAULT_CONFIG))
+    parser.add_argument('--cache-dir', help="local state kept between runs")
+    parser.add_argument('--log-file', help="poaupdater log, appended")
+    parser.add_argument('-w', '--workers', type=int, help="steps or calls run at once")
+    commands = parser.add_subparsers(title='commands')
+
+    cmd = commands.add_parser('deploy', help="run deployment steps not done yet")
+    cmd.set_defaults(func=cmd_deploy)
+
+    cmd = commands.add_parser('plan', help="print deployment steps not done yet")
+    cmd.set_defaults(func=cmd_plan)
+
+    cmd = commands.add_parser('check-nodes',
+        help="check reachability and SSH login of configured nodes")
+    cmd.set_defaults(func=cmd_check_nodes)
+
+    cmd = commands.add_parser('register-node', help="register shared node, print host_id")
+    cmd.add_argument('backnet')
+    cmd.add_argument('--frontnet')
+    cmd.add_argument('--hostname')
+    cmd.add_argument('--attr', action='append', help="provisioning attribute, repeatable")
+    cmd.add_argument('--ready', action='store_true', help="set ready to provide")
+    cmd.set_defaults(func=cmd_register_node)
+
+    cmd = commands.add_parser('configure-hosts',
+        help="set provisioning attributes and readiness of hosts")
+    cmd.add_argument('hosts', nargs='+', help="host_id, IP address or hostname",
+        type=lambda host: int(host) if host.isdigit() else host)
+    cmd.add_argument('--attr', action='append', help="provisioning attribute, repeatable")
+    ready = cmd.add_mutually_exclusive_group()
+    ready.add_argument('--ready', action='store_true', default=None)
+    ready.add_argument('--not-ready', dest='ready', action='store_false')
+    cmd.set_defaults(func=cmd_configure_hosts)
+
+    cmd = commands.add_parser('add-dns', help="add DNS records")
+    cmd.add_argument('domain')
+    cmd.add_argument('host')
+    cmd.add_argument('type')
+    cmd.add_argument('data', nargs='+')
+    cmd.set_defaults(func=cmd_add_dns)
+
+    cmd = commands.add_parser('add-domains',
+        help="add domains and subdomains from CSV or JSON lines file")
+    cmd.add_argument('file')
+    cmd.set_defaults(func=cmd_add_domains)
+
+    cmd = commands.add_parser('config', help="print configuration")
+    cmd.set_defaults(func=cmd_config)
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    path = args.config
+    if path is None and os.path.exists(DEFAULT_CONFIG):
+        path = DEFAULT_CONFIG
+    try:
+        config = flow.load_config(path, cache_dir=args.cache_dir, log_file=args.log_file,
+            workers=args.workers)
+        log_handler = flow.start_logging(config)
+        try:
+            args.func(config, args)
+        finally:
+            flow.stop_logging(log_handler)
+    except OSAError as err:
+        sys.stderr.write("osadt: {0}\n".format(err))
+        return 1
+    return 0
@@ -0,0 +1,148 @@
+import threading
+from contextlib import contextmanager
+
+from errors import OSAError
+import tracing
+
+
+class ConnectionPool(object):
+    """Pool of reusable uSysDB connections"""
+
+    size = 4
+
+    def __init__(self, connect=None, size=None, tracer=None):
+        """
+        :param connect: callable returning new connection, uSysDB.connect by default
+        :param size: max number of idle connections kept open
+        :param tracer: tracing.Tracer recording queries, tracing.tracer by default
+        """
+        self.connect = connect or self._connect
+        self.tracer = tracer or tracing.tracer
+        self.size = size or self.size
+        self.lock = threading.Lock()
+        self.idle = []
+
+    @staticmethod
+    def _connect():
+        from poaupdater import uSysDB
+        return uSysDB.connect()
+
+    @contextmanager
+    def connection(self):
+        """Borrow connection, the transaction is committed when it is returned"""
+        with self.lock:
+            con = self.idle.pop() if self.idle else None
+        if con is None:
+            con = self.connect()
+        try:
+            yield con
+            con.commit()
+        except Exception:
+            # connection state is unknown, do not reuse it
+            con.close()
+            raise
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(con)
+                con = None
+        if con is not None:
+            con.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for con in idle:
+            con.close()
+
+    def query(self, sql, params=()):
+        """Run parameterized query
+
+        :returns: list of rows
+        """
+        with self.tracer.span('db', ' '.join(sql.split())):
+            with self.connection() as con:
+                cur = con.cursor()
+                cur.execute(sql, params)
+                return cur.fetchall()
+
+    def query_value(self, sql, params=()):
+        """Run parameterized query
+
+        :returns: the first column of the first row or None
+        """
+        rows = self.query(sql, params)
+        return rows[0][0] if rows else None
+
+
+class SystemDB(object):
+    """Lookups in OA system database"""
+
+    # returns (request_id, status) rows, status coded as pem.getRequestStatus does:
+    # 0 - done, 1 - in progress, 2 - failed; {ids} is replaced with placeholders.
+    # The tables are not documented and differ between OA versions, so there is no default,
+    # the query has to be written for the OA version and checked against pem.getRequestStatus.
+    request_status_query = None
+
+    def __init__(self, pool=None, request_status_query=None):
+        self.pool = pool or ConnectionPool()
+        if request_status_query is not None:
+            self.request_status_query = request_status_query
+
+    def get_request_statuses(self, request_ids):
+        """Get status of all requests with one query
+
+        :returns: {request_id: status, ..}, requests not found are missing
+        :raises OSAError: if request_status_query is not set
+        """
+        if not self.request_status_query:
+            raise OSAError("Request status query is not set")
+        request_ids = list(request_ids)
+        if not request_ids:
+            return {}
+        sql = self.request_status_query.format(ids=', '.join(['%s'] * len(request_ids)))
+        return dict( (request_id, status) for request_id, status in
+            self.pool.query(sql, request_ids) )
+
+    def get_ip_pool_id(self, name):
+        """
+        :returns: pool_id or None
+        """
+        return self.pool.query_value(
+            "SELECT pool_id FROM ip_pools WHERE pool_name = %s", (name,))
+
+    def get_ip_pools(self):
+        """
+        :returns: {pool_name: pool_id, ..}
+        """
+        return dict( (name, pool_id) for pool_id, name in
+            self.pool.query("SELECT pool_id, pool_name FROM ip_pools") )
+
+    def get_brands(self):
+        """
+        :returns: {brand_name: brand_id, ..}
+        """
+        return dict( (name, brand_id) for brand_id, name in
+            self.pool.query("SELECT brand_id, brand_name FROM brands") )
+
+    def get_brand_id(self, name):
+        """
+        :returns: brand_id or None
+        """
+        return self.pool.query_value(
+            "SELECT brand_id FROM brands WHERE brand_name = %s", (name,))
+
+    def get_host_platform(self, host_id):
+        """
+        :returns: platform_id or None
+        """
+        return self.pool.query_value(
+            "SELECT platform_id FROM hosts WHERE host_id = %s", (host_id,))
+
+    def get_host_ips(self, host_id):
+        """
+        :returns: [(ip_address, if_id), ..], IP addresses are as stored - with leading 0s in octets
+        """
+        return self.pool.query("""SELECT ip_address, if_id
+            FROM configured_ips
+            WHERE host_id = %s""",
+            (host_id,))
@@ -0,0 +1,2 @@
+class OSAError(Exception):
+    pass
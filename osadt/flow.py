@@ -0,0 +1,402 @@
+"""Deployment flow of osadt.py and osadt command
+
+Configuration is a dict of the options of osadt.py CONFIGURATION section,
+either taken from osadt.py globals or read from a configuration file of
+the same syntax.
+"""
+
+import os
+
+from errors import OSAError
+from logs import setup_logging, stop_logging
+from journal import Journal, fingerprint
+from onboarding import Onboarding, read_entries
+from plan import Snapshot
+from preflight import Preflight, format_results
+from steps import Deployment
+
+# options and their defaults, None for class defaults of OSA
+DEFAULTS = {
+    'licurl': None,
+    'licfile': None,
+    'provdomain': None,
+    'cp_password': None,
+    'brand_attr': 'branding',
+    'linpgh_attr': 'External Provisioning',
+    'cp_ip': None,
+    'cp_ipnetmask': None,
+    'cp_prefix': 'cp',
+    'cp_domain': None,
+    'login': None,
+    'password': None,
+    'nodes': {},
+    'domains_file': None,
+    'install_updates_cmd': "/usr/local/pem/bin/pa_updates_installer --install",
+    'command_timeout': 3600,
+    'command_retries': 2,
+    'command_on_failure': 'abort',
+    'workers': 8,
+    'plan_only': False,
+    'trace_file': 'osadt.trace.json',
+    'preflight': True,
+    'api_limits': None,
+    'api_rates': None,
+    'poll_db': False,
+    'request_status_query': None,
+    'adaptive_timeouts': True,
+    'timeout_overrides': None,
+    'keep_alive': True,
+    'cache_dir': '.osadt',
+    'resume': True,
+    'log_file': 'poaupdater.log',
+    'json_log': 'osadt.log.jsonl',
+    'json_log_max_bytes': 10 * 1024 * 1024,
+    'json_log_backups': 5,
+}
+
+# options which do not change the result of deployment steps
+RUN_OPTIONS = ('plan_only', 'workers', 'trace_file', 'keep_alive', 'poll_db',
+    'request_status_query', 'api_limits', 'api_rates', 'adaptive_timeouts', 'timeout_overrides',
+    'preflight', 'resume', 'cache_dir', 'command_timeout', 'command_retries',
+    'command_on_failure', 'log_file', 'json_log', 'json_log_max_bytes', 'json_log_backups')
+
+
+def from_globals(values):
+    """
+    :param values: globals of osadt.py
+    :returns: configuration
+    """
+    config = dict(DEFAULTS)
+    config.update( (name, values[name]) for name in DEFAULTS if name in values )
+    return config
+
+
+def load_config(path=None, **overrides):
+    """Read configuration file
+
+    The file is Python code setting the options of osadt.py CONFIGURATION section.
+    :param overrides: options set in command line
+    :returns: configuration, defaults for options not set
+    :raises OSAError: when the file can not be read or has unknown options
+    """
+    values = {}
+    if path:
+        try:
+            execfile(path, values)
+        except IOError as err:
+            raise OSAError("Can not read configuration file {0}: {1}".format(path, err))
+        values.pop('__builtins__', None)
+        unknown = sorted( name for name in values
+            if name not in DEFAULTS and not name.startswith('_') )
+        if unknown:
+            raise OSAError("Unknown options in {0}: {1}".format(path, ', '.join(unknown)))
+    values.update( (name, value) for name, value in overrides.items() if value is not None )
+    return from_globals(values)
+
+
+def check_config(config, *required):
+    """
+    :raises OSAError: when some of the required options are not set
+    """
+    missing = [ name for name in required if config.get(name) is None ]
+    if missing:
+        raise OSAError("Options are not set: " + ', '.join(missing))
+
+
+def start_logging(config):
+    """Write steps, API calls, requests and command output to json_log, see setup_logging()
+
+    :returns: handler to pass to stop_logging()
+    """
+    if not config['json_log']:
+        return None
+    return setup_logging(config['json_log'], config['json_log_max_bytes'],
+        config['json_log_backups'])
+
+
+def make_osa(config):
+    """
+    :returns: OSA set up according to the configuration, it connects on the first call
+    :raises OSAError: if poaupdater is not installed
+    """
+    from osa import OSA
+    try:
+        import poaupdater
+    except ImportError:
+        raise OSAError("poaupdater is not found, run the command on the management node")
+    osa = OSA(cp_password=config['cp_password'], keep_alive=config['keep_alive'],
+        api_limits=config['api_limits'], api_rates=config['api_rates'],
+        poll_db=config['poll_db'], request_status_query=config['request_status_query'],
+        durations_file=os.path.join(config['cache_dir'], 'durations.json'),
+        timeout_overrides=config['timeout_overrides'],
+        adaptive_timeouts=config['adaptive_timeouts'], log_file=config['log_file'])
+    osa.runner.timeout = config['command_timeout']
+    osa.runner.retries = config['command_retries']
+    osa.runner.on_failure = config['command_on_failure']
+    return osa
+
+
+def build(osa, config):
+    """Add deployment steps for the configuration
+
+    :returns: (Deployment, Snapshot)
+    """
+    c = config
+    nodes = c['nodes']
+    provdomain = c['provdomain']
+    login = c['login']
+    password = c['password']
+    # steps are run as soon as the steps they depend on are finished,
+    # steps found in the journal or done in the snapshot of the system are skipped
+    journal = None
+    if c['resume']:
+        journal = Journal(os.path.join(c['cache_dir'], 'journal.jsonl'), config_fingerprint(c))
+    deploy = Deployment(workers=c['workers'], journal=journal)
+    snapshot_domains = [provdomain]
+
+    # install license
+    if c['licfile']:
+        deploy.add('license', osa.upload_license,
+            kwargs={'filename': c['licfile'], 'cache_dir': c['cache_dir']}, journal=False,
+            title="Installing license from file " + c['licfile'])
+    else:
+        # the license may be renewed at the same URL, it is uploaded only if changed anyway
+        deploy.add('license', osa.upload_license,
+            kwargs={'url': c['licurl'], 'cache_dir': c['cache_dir']}, journal=False,
+            title="Installing license from URL " + c['licurl'])
+
+    # install OSA updates, the installer finds new updates itself, so it is run every time
+    deploy.add('updates', osa.install_updates, (c['install_updates_cmd'],), after=['license'],
+        journal=False, title="Installing avalible updates")
+
+    # add provider's domain
+    deploy.add('domain_id', osa.add_provider_domain, (provdomain,), after=['updates'],
+        exists=lambda: snapshot.domain_id(provdomain, owner_id=1),
+        title="Creating provider's domain")
+    deploy.add('attrs', osa.create_attrs, (c['linpgh_attr'], c['brand_attr']), after=['updates'],
+        exists=lambda: snapshot.has_attrs(c['linpgh_attr'], c['brand_attr']))
+
+    # privacy proxy
+    node = nodes.get('linpps')
+    if node:
+        deploy.add('linpps_host_id', osa.register_node, kwargs={'register': osa.register_linpps,
+            'backnet': node['backnet'], 'login': login, 'password': password,
+            'frontnet': node['frontnet']}, after=['updates'],
+            title="Adding privacy proxy " + node['backnet'])
+
+    # linpgh
+    node = nodes.get('linpgh')
+    if node:
+        deploy.add('linpgh_host_id', osa.register_node, kwargs={
+            'backnet': node['backnet'], 'login': login, 'password': password,
+            'frontnet': node['frontnet'], 'attrs': [c['linpgh_attr']], 'ready': True},
+            after=['attrs'], title="Adding Linux provisioning getaway " + node['backnet'])
+
+    # nses
+    nses = nodes.get('nses')
+    if nses:
+        ns_hostnames = [node['hostname'] for node in nses]
+        ns_steps = []
+        for i, node in enumerate(nses):
+            ns_steps.append('ns{0}_host_id'.format(i))
+            deploy.add(ns_steps[-1], osa.register_dns,
+                (node['backnet'], login, password, node['frontnet']),
+                {'new_hostname': node.get('hostname')}, after=['updates'],
+                exists=lambda backnet=node['backnet']: snapshot.host_id(backnet),
+                title="Adding DNS server " + node['backnet'])
+        deploy.add('dns_rt_id', osa.create_dns_rt, ns_hostnames, after=ns_steps,
+            exists=lambda: snapshot.rt_id('DNS Hosting', 'DNS Hosting'))
+        deploy.add('dns_hosting', osa.add_dns_hosting, (provdomain,),
+            requires=['dns_rt_id'], after=['domain_id'])
+        # add A records
+        ns_records = []
+        for node in nses:
+            ns_hostname = node['hostname']
+            ns_fip = node['frontnet']
+            # subdomain of provdomain?
+            if ns_hostname.endswith('.' + provdomain):
+                prefix = ns_hostname[:-len(provdomain)-1]
+                ns_records.append((provdomain, prefix, 'A', ns_fip))
+        def add_ns_records():
+            failed = [ r for r in osa.add_dns_records(ns_records) if r['status'] == 'failed' ]
+            if failed:
+                raise OSAError("Failed to add DNS records: " + "; ".join(
+                    "{host} {type} {data}: {error}".format(**r) for r in failed))
+        deploy.add('ns_records', add_ns_records, after=['dns_hosting'])
+
+    # UI host
+    node = nodes.get('ui')
+    if node:
+        deploy.add('branding_host_id', osa.register_node, kwargs={'register': osa.register_ui,
+            'backnet': node['backnet'], 'login': login, 'password': password,
+            'frontnet': node['frontnet'], 'attrs': [c['brand_attr']], 'ready': True},
+            after=['attrs'], title="Adding UI server " + node['backnet'])
+        # deploy.add('ui', osa.add_ui, requires={'cluster_id': 'branding_host_id'})
+        # configure RTs for branding
+        def set_bap_rt_attrs():
+            bap_rt_id = osa.get_rt_id('Branding access points', 'Branding access points')
+            osa.set_rt_attrs(bap_rt_id, c['brand_attr'])
+            return bap_rt_id
+        deploy.add('bap_rt_id', set_bap_rt_attrs, after=['branding_host_id'])
+        # deploy.add('brand_web_rt_id', osa.create_brand_web_rt, (provdomain,),
+        #     {'brand_attr': c['brand_attr']}, after=['domain_id'])
+        cp_domain = c['cp_domain']
+        if cp_domain:
+            deploy.add('cp_domain_id', osa.add_provider_domain, (cp_domain,), after=['updates'],
+                exists=lambda: snapshot.domain_id(cp_domain, owner_id=1))
+        else:
+            cp_domain = c['cp_prefix'] + '.' + provdomain
+            deploy.add('cp_domain_id', osa.add_provider_subdomain, (provdomain, c['cp_prefix']),
+                after=['domain_id'], exists=lambda: snapshot.domain_id(cp_domain, owner_id=1))
+        snapshot_domains.append(cp_domain)
+        brand_after = ['cp_domain_id', 'branding_host_id', 'bap_rt_id']
+        has_exclusive_ip = bool(c['cp_ip'])
+        if has_exclusive_ip:
+            # create branding ip pool
+            deploy.add('pool_id', osa.create_ip_pool, (cp_domain, c['cp_ip'], c['cp_ip'],
+                c['cp_ipnetmask'], ['COMMON.BRANDING', 'SHARED.HOSTING']), after=['updates'],
+                exists=lambda: snapshot.pool_id(cp_domain))
+            deploy.add('pool_binding', osa.bind_ip_pool, kwargs={'if_ip': node['frontnet']},
+                requires={'host_id': 'branding_host_id', 'pool_id': 'pool_id'})
+            brand_after.append('pool_binding')
+        deploy.add('brand_id', osa.create_prov_brand, (cp_domain, has_exclusive_ip),
+            after=brand_after, exists=lambda: snapshot.brand_id(cp_domain))
+
+    # bulk domains
+    domains_file = c['domains_file']
+    if domains_file:
+        def onboard_domains():
+            counts = onboard(osa, domains_file, c['workers'])
+            if counts['failed']:
+                raise OSAError("Failed to add {0} domains, see {1}.results".format(
+                    counts['failed'], domains_file))
+        # run every time, done entries are skipped by the results file and
+        # entries added to domains_file since the last run are added as well
+        deploy.add('domains', onboard_domains,
+            after=['domain_id'] + (['dns_hosting'] if nses else []), journal=False,
+            title="Adding domains from " + domains_file)
+
+    ######## BA deployment
+    ba = nodes.get('ba')
+    if ba:
+        deploy.add('badb_host_id', osa.register_badb,
+            (ba['db']['backnet'], login, password, ba['app']['backnet']), after=['updates'],
+            exists=lambda: snapshot.host_id(ba['db']['backnet']),
+            title="Adding BA Database server " + ba['db']['backnet'])
+        # registered one by one as before, the DB role refers to the application host
+        deploy.add('baapp_host_id', osa.register_baapp, (ba['app']['backnet'], login, password,
+            ba['app']['frontnet'], ba['app']['hostname']), after=['badb_host_id'],
+            exists=lambda: snapshot.host_id(ba['app']['backnet']),
+            title="Adding BA Application server " + ba['app']['backnet'])
+        deploy.add('bastore_host_id', osa.register_store, (ba['store']['backnet'], login,
+            password, ba['store']['frontnet'], ba['store'].get('hostname')),
+            after=['baapp_host_id'],
+            exists=lambda: snapshot.host_id(ba['store']['backnet']),
+            title="Adding BA Store server " + ba['store']['backnet'])
+
+    # loaded only if some steps are not in the journal
+    snapshot = Snapshot(osa, domains=snapshot_domains, rt_classes=['DNS Hosting'], lazy=True)
+    return deploy, snapshot
+
+
+def config_fingerprint(config):
+    return fingerprint(dict( (name, value) for name, value in config.items()
+        if name not in RUN_OPTIONS ))
+
+
+def node_checks(config, todo=None):
+    """
+    :param todo: names of steps to run, only nodes with registration step in it are checked
+    :returns: Preflight with configured nodes
+    """
+    nodes = config['nodes']
+    checks = Preflight(config['login'], config['password'])
+    for name, step in (('linpps', 'linpps_host_id'), ('linpgh', 'linpgh_host_id'),
+        ('ui', 'branding_host_id')):
+        if nodes.get(name) and (todo is None or step in todo):
+            checks.add(name, nodes[name]['backnet'], nodes[name]['frontnet'])
+    for i, node in enumerate(nodes.get('nses') or []):
+        if todo is None or 'ns{0}_host_id'.format(i) in todo:
+            checks.add('ns{0}'.format(i), node['backnet'], node['frontnet'])
+    for name, node in sorted((nodes.get('ba') or {}).items()):
+        if todo is None or 'ba{0}_host_id'.format(name) in todo:
+            checks.add('ba' + name, node['backnet'], node.get('frontnet'))
+    return checks
+
+
+def check_nodes(checks):
+    """Run node checks and print the results
+
+    :returns: True if all nodes are fine
+    """
+    if not checks.nodes:
+        return True
+    print("Checking nodes")
+    results = checks.run()
+    print(format_results(results))
+    return not [ r for r in results if r['errors'] ]
+
+
+def onboard(osa, domains_file, workers):
+    """Add domains from the file, see Onboarding
+
+    :returns: {'done': n, 'failed': n, 'skipped': n}
+    """
+    counts = Onboarding(osa, domains_file + '.results', workers=workers).run(
+        read_entries(domains_file))
+    print("Domains: {done} added, {skipped} done before, {failed} failed".format(**counts))
+    return counts
+
+
+def run(config, osa=None):
+    """Plan and, unless plan_only is set, run the deployment
+
+    :returns: {step_name: result, ..} of planned or finished steps
+    :raises OSAError: when some steps or node checks failed
+    """
+    check_config(config, 'provdomain', 'cp_password', 'login', 'password')
+    if not config['licurl'] and not config['licfile']:
+        raise OSAError("Options are not set: licurl or licfile")
+    log_handler = start_logging(config)
+    try:
+        return _run(config, osa or make_osa(config))
+    finally:
+        stop_logging(log_handler)
+
+
+def _run(config, osa):
+    deploy, snapshot = build(osa, config)
+    print("Loading current state")
+    done, todo = deploy.plan()
+    print("Done already: " + (', '.join(sorted(done)) or 'nothing'))
+    print("To run: " + (', '.join(todo) or 'nothing'))
+    if config['preflight']:
+        # nodes with registration step to run
+        checks = node_checks(config, todo)
+        checks.nodes = [ node for node in checks.nodes if not snapshot.host_id(node['backnet']) ]
+        if not check_nodes(checks) and not config['plan_only']:
+            raise OSAError("Nodes check failed, fix the nodes or configuration,"
+                " set preflight = False to skip the check")
+    if config['plan_only']:
+        return done
+    try:
+        return deploy.run(skip_done=True)
+    finally:
+        finish_run(osa, config)
+
+
+def finish_run(osa, config):
+    """Save request durations, print timing summary and export the trace
+
+    Errors are printed only, so that they do not replace the error of the deployment.
+    """
+    try:
+        osa.timeouts.save()
+    except Exception as err:
+        print("Failed to save request durations: {0}".format(err))
+    try:
+        print(osa.tracer.format_summary())
+        if config['trace_file']:
+            osa.tracer.export_chrome_trace(config['trace_file'])
+    except Exception as err:
+        print("Failed to export trace: {0}".format(err))
@@ -0,0 +1,92 @@
+import time
+import threading
+
+from errors import OSAError
+
+# timeout of waits which should not time out, waits without timeout can not be
+# interrupted with Ctrl-C in Python 2
+FOREVER = 365 * 24 * 3600
+
+
+class Future(object):
+    """Result of an operation which is not finished yet"""
+
+    def __init__(self, name=None):
+        """
+        :param name: description of the operation, used in timeout errors
+        """
+        self.name = name
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._result = None
+        self._error = None
+
+    def done(self):
+        return self._finished.is_set()
+
+    def set_result(self, result):
+        self._finish(result, None)
+
+    def set_exception(self, error):
+        self._finish(None, error)
+
+    def _finish(self, result, error):
+        with self._lock:
+            if self._finished.is_set():
+                return
+            self._result = result
+            self._error = error
+            self._finished.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        """Call callback(future) when finished, right away if it is finished already"""
+        with self._lock:
+            if not self._finished.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def wait(self, timeout=None):
+        """Wait till finished
+
+        :raises OSAError: in case of timeout
+        """
+        if not self._finished.wait(timeout if timeout is not None else FOREVER):
+            raise OSAError("Timeout ({0}) while waiting for {1}".format(timeout, self.name))
+
+    def exception(self, timeout=None):
+        """
+        :returns: exception raised by the operation or None
+        :raises OSAError: in case of timeout
+        """
+        self.wait(timeout)
+        return self._error
+
+    def result(self, timeout=None):
+        """
+        :returns: result of the operation
+        :raises: exception raised by the operation
+        :raises OSAError: in case of timeout
+        """
+        self.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def gather(futures, timeout=None):
+    """Wait for all futures
+
+    :param timeout: for all futures together
+    :returns: list of results in the same order
+    :raises: the first exception raised by the operations, after all are finished
+    """
+    futures = list(futures)
+    deadline = timeout and time.time() + timeout
+    for future in futures:
+        future.wait(deadline and max(deadline - time.time(), 0))
+    return [ future.result() for future in futures ]
@@ -0,0 +1,83 @@
+import time
+import threading
+
+
+class TokenBucket(object):
+    """Allows rate calls per second on average, up to burst at once"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Wait for a token
+
+        :returns: seconds waited
+        """
+        start = time.time()
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - start
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class Governor(object):
+    """Limits OpenAPI calls per method to spare the management node
+
+    limits - max number of requests of the method running at once, i.e. from
+    the call till its task is finished;
+    rates - max calls of the method per second, number or (rate, burst).
+    Method '*' sets the limits for methods not listed, its rate is shared by
+    them. Callers over the limit wait, nothing fails.
+    Example Governor(limits={'pem.registerSharedNode': 4, '*': 32},
+        rates={'pem.packaging.installPackageSync': (2, 5)})
+    """
+
+    def __init__(self, limits=None, rates=None):
+        self.limits = dict(limits or {})
+        self.cond = threading.Condition()
+        self.running = {}
+        self.buckets = {}
+        for method, rate in (rates or {}).items():
+            if not isinstance(rate, (tuple, list)):
+                rate = (rate,)
+            self.buckets[method] = TokenBucket(*rate)
+
+    def _limit(self, method):
+        return self.limits.get(method, self.limits.get('*'))
+
+    def acquire(self, method):
+        """Wait till the method may be called
+
+        Every acquire() must be followed by release() when the request is finished.
+        :returns: seconds waited
+        """
+        start = time.time()
+        limit = self._limit(method)
+        with self.cond:
+            while limit is not None and self.running.get(method, 0) >= limit:
+                self.cond.wait(1)
+                limit = self._limit(method)
+            self.running[method] = self.running.get(method, 0) + 1
+        bucket = self.buckets.get(method, self.buckets.get('*'))
+        if bucket is not None:
+            try:
+                bucket.take()
+            except BaseException:
+                self.release(method)
+                raise
+        return time.time() - start
+
+    def release(self, method):
+        with self.cond:
+            self.running[method] -= 1
+            self.cond.notify_all()
@@ -0,0 +1,65 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+def fingerprint(config):
+    """
+    :param config: {name: value, ..} of configuration options
+    :returns: hash of the configuration
+    """
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=repr)).hexdigest()
+
+
+class Journal(object):
+    """Finished deployment steps and their results, kept between runs
+
+    Every finished step is appended to the file as a JSON line with the
+    fingerprint of the configuration it was run with. Only entries with the
+    current fingerprint are loaded, so changed configuration is verified
+    against OA again. Remove the file to verify everything.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        :returns: {step_name: result, ..} of steps finished with the same configuration
+        """
+        results = {}
+        if not os.path.exists(self.path):
+            return results
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # cut by interruption
+                if entry.get('fingerprint') == self.fingerprint:
+                    results[entry['step']] = entry['result']
+        return results
+
+    def record(self, step, result):
+        """Append finished step
+
+        :returns: False if the result can not be kept in JSON, the step is not recorded then
+        """
+        try:
+            line = json.dumps({'step': step, 'result': result, 'fingerprint': self.fingerprint,
+                'time': time.time()})
+        except (TypeError, ValueError):
+            return False
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        return True
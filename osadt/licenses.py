@@ -0,0 +1,81 @@
+import os
+import json
+import hashlib
+import urllib2
+import threading
+
+
+class LicenseCache(object):
+    """Downloaded licenses and hash of the license uploaded last
+
+    Licenses are kept in the directory with ETag and Last-Modified of the
+    download, so the next download of the same URL is a conditional request.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_file = os.path.join(directory, 'licenses.json')
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.index_file):
+            return {'urls': {}, 'active': None}
+        with open(self.index_file) as f:
+            return json.load(f)
+
+    def _save(self, index):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        tmp = self.index_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.rename(tmp, self.index_file)
+
+    @staticmethod
+    def digest(lic):
+        return hashlib.sha256(lic).hexdigest()
+
+    def fetch(self, url):
+        """Download license, the cached copy is used if it is not modified
+
+        :returns: license
+        """
+        with self.lock:
+            index = self._load()
+            entry = index['urls'].get(url)
+            path = os.path.join(self.directory,
+                'license-' + hashlib.sha1(url).hexdigest() + '.xml')
+            request = urllib2.Request(url)
+            if entry and os.path.exists(path):
+                if entry.get('etag'):
+                    request.add_header('If-None-Match', entry['etag'])
+                if entry.get('last_modified'):
+                    request.add_header('If-Modified-Since', entry['last_modified'])
+            try:
+                response = urllib2.urlopen(request)
+            except urllib2.HTTPError as err:
+                if err.code != 304:
+                    raise
+                with open(path, 'rb') as f:
+                    return f.read()
+            lic = response.read()
+            headers = response.info()
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(path, 'wb') as f:
+                f.write(lic)
+            index['urls'][url] = {'etag': headers.getheader('ETag'),
+                'last_modified': headers.getheader('Last-Modified')}
+            self._save(index)
+            return lic
+
+    def is_active(self, lic):
+        """Check if the license is the one uploaded last"""
+        with self.lock:
+            return self._load()['active'] == self.digest(lic)
+
+    def set_active(self, lic):
+        with self.lock:
+            index = self._load()
+            index['active'] = self.digest(lic)
+            self._save(index)
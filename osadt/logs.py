@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import time
+import Queue
+import logging
+import threading
+import logging.handlers
+
+from tracker import SECRET_ARGS
+
+# logger of the package, see setup_logging()
+log = logging.getLogger('osadt')
+log.addHandler(logging.NullHandler())
+
+
+def rotate(path, backups):
+    """Rename path to path.1, path.1 to path.2, .. keeping backups files"""
+    for i in range(backups - 1, 0, -1):
+        src = "{0}.{1}".format(path, i)
+        if os.path.exists(src):
+            os.rename(src, "{0}.{1}".format(path, i + 1))
+    if os.path.exists(path):
+        os.rename(path, path + '.1')
+
+
+class LazyFile(object):
+    """Log file opened for appending on the first write
+
+    Logs of the previous runs are kept, every run starts with a header line.
+    The file is rotated on opening when it is larger than max_bytes.
+    """
+
+    max_bytes = 10 * 1024 * 1024
+    backups = 5
+
+    def __init__(self, path, max_bytes=None, backups=None):
+        self.path = path
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if backups is not None:
+            self.backups = backups
+        self.lock = threading.Lock()
+        self.f = None
+
+    def _open(self):
+        with self.lock:
+            if self.f is None:
+                if (self.max_bytes and os.path.exists(self.path)
+                    and os.path.getsize(self.path) > self.max_bytes):
+                    rotate(self.path, self.backups)
+                f = open(self.path, 'a')
+                f.write("===== {0} pid {1} =====\n".format(
+                    time.strftime('%Y-%m-%d %H:%M:%S'), os.getpid()))
+                self.f = f
+        return self.f
+
+    def write(self, data):
+        self._open().write(data)
+
+    def writelines(self, lines):
+        self._open().writelines(lines)
+
+    def flush(self):
+        if self.f is not None:
+            self.f.flush()
+
+    def close(self):
+        with self.lock:
+            if self.f is not None:
+                self.f.close()
+                self.f = None
+
+
+# values of SECRET_ARGS in dict reprs, JSON and name=value text
+SECRET_VALUE = re.compile(r"""(\b(?:{0})['"]?\s*[:=]\s*)(u?'(?:\\.|[^'\\])*'|u?"(?:\\.|[^"\\])*"|[^\s,;&'"}})]+)"""
+    .format('|'.join(SECRET_ARGS)))
+
+
+def hide_secrets(text):
+    """
+    :returns: text with values of SECRET_ARGS replaced by ***
+    """
+    return SECRET_VALUE.sub(lambda m: m.group(1) +
+        ("'***'" if m.group(2)[-1] in '\'"' else '***'), text)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats record as JSON line with the known extra fields, secrets hidden"""
+
+    fields = ('kind', 'step', 'method', 'request_id', 'host', 'host_id', 'domain_name',
+        'command', 'duration', 'outcome')
+
+    def format(self, record):
+        entry = {'time': record.created, 'level': record.levelname, 'logger': record.name,
+            'thread': record.threadName, 'msg': hide_secrets(record.getMessage())}
+        for field in self.fields:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if isinstance(entry.get('outcome'), basestring):
+            entry['outcome'] = hide_secrets(entry['outcome'])
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = hide_secrets(record.exc_text)
+        return json.dumps(entry, default=str)
+
+
+class QueueHandler(logging.Handler):
+    """Hands records to target handler working in background thread
+
+    Logging threads only put the record to the queue. When the queue is
+    full, records are dropped and counted rather than the callers blocked.
+    """
+
+    def __init__(self, target, maxsize=10000):
+        logging.Handler.__init__(self)
+        self.target = target
+        self.queue = Queue.Queue(maxsize)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name='QueueHandler')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def emit(self, record):
+        # the record is formatted in another thread, arguments may change till then
+        try:
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            self.queue.put_nowait(record)
+        except Queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            try:
+                self.target.handle(record)
+            except Exception:
+                pass  # must not stop the thread
+
+    def close(self):
+        """Write out queued records and close the target"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(10)
+        self.target.close()
+        logging.Handler.close(self)
+
+
+def setup_logging(path, max_bytes=10 * 1024 * 1024, backups=5, level=logging.DEBUG):
+    """Write records of osadt loggers to the file as JSON lines from background thread
+
+    :param max_bytes: size of the file to rotate it at, see RotatingFileHandler
+    :param backups: number of rotated files kept
+    :returns: QueueHandler to close at exit, None if logging is set up already
+    """
+    for handler in log.handlers:
+        if isinstance(handler, QueueHandler):
+            return None
+    target = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+        backupCount=backups, delay=True)
+    target.setFormatter(JsonFormatter())
+    handler = QueueHandler(target)
+    log.addHandler(handler)
+    log.setLevel(level)
+    log.propagate = False
+    return handler
+
+
+def stop_logging(handler):
+    """Remove handler returned by setup_logging() and close it"""
+    if handler is not None:
+        log.removeHandler(handler)
+        handler.close()
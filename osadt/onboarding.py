@@ -0,0 +1,185 @@
+import csv
+import json
+import threading
+from multiprocessing.pool import ThreadPool
+
+from errors import OSAError
+from futures import Future
+
+
+def read_entries(path):
+    """Read domains to onboard one by one
+
+    File is JSON lines if its name ends with .jsonl or .json, CSV with header otherwise.
+    Fields:
+        domain - domain name, required
+        prefix - to add subdomain prefix.domain
+        account_id - owner of the domain, provider (1) by default
+        subscription_id - subscription of the subdomain, provider subdomain by default
+        dns_hosting - add DNS hosting, 'yes'/'no' or true/false
+    Example CSV:
+        domain,prefix,dns_hosting
+        prov.tld,,yes
+        prov.tld,cp,no
+    :returns: iterator of entry dicts
+    """
+    with open(path) as f:
+        if path.endswith('.jsonl') or path.endswith('.json'):
+            for num, line in enumerate(f, start=1):
+                if line.strip():
+                    yield _entry(json.loads(line), path, num)
+        else:
+            for num, row in enumerate(csv.DictReader(f), start=2):
+                yield _entry(row, path, num)
+
+
+def _entry(row, path, num):
+    if not row.get('domain'):
+        raise OSAError("{0}:{1}: no domain".format(path, num))
+    dns_hosting = row.get('dns_hosting')
+    if not isinstance(dns_hosting, bool):
+        dns_hosting = str(dns_hosting or '').strip().lower() in ('yes', 'true', '1')
+    return {
+        'domain': row['domain'].strip(),
+        'prefix': (row.get('prefix') or '').strip() or None,
+        'account_id': int(row.get('account_id') or 1),
+        'subscription_id': int(row['subscription_id']) if row.get('subscription_id') else None,
+        'dns_hosting': dns_hosting,
+    }
+
+
+def entry_name(entry):
+    if entry['prefix']:
+        return entry['prefix'] + '.' + entry['domain']
+    return entry['domain']
+
+
+class Onboarding(object):
+    """Adds many domains and subdomains read from a file
+
+    Entries are read one by one and handed to workers, at most workers * 2 of them
+    are in memory at once. Every processed entry is appended to the results file
+    as a JSON line {'name': .., 'status': 'done' | 'failed', 'domain_id': .., 'error': ..},
+    entries done according to the results file are skipped, so an interrupted
+    run can be repeated with the same files. Only names from the results file are
+    kept in memory, duplicates in the input are processed again, add() is reenterable.
+    Subdomains wait till their domain earlier in the file is processed and fail
+    if it failed, so domains should precede their subdomains. Duplicates wait
+    for the previous entry of the same name.
+    """
+
+    workers = 8
+
+    def __init__(self, osa, results_file, workers=None, dns_rt_id=None):
+        """
+        :param results_file: path of the results file, appended
+        :param dns_rt_id: DNS hosting resource type, see OSA.add_dns_hosting()
+        """
+        self.osa = osa
+        self.results_file = results_file
+        if workers is not None:
+            self.workers = workers
+        self.dns_rt_id = dns_rt_id
+        self.write_lock = threading.Lock()
+        # {name: Future} of entries being processed
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+    def done_names(self):
+        """
+        :returns: set of names done in previous runs
+        """
+        done = set()
+        try:
+            with open(self.results_file) as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        continue  # cut by interruption
+                    if result.get('status') == 'done':
+                        done.add(result['name'])
+        except IOError:
+            pass
+        return done
+
+    def add(self, entry):
+        """Add domain or subdomain of the entry, see read_entries()
+
+        Reenterable
+        :returns: domain_id
+        """
+        if entry['prefix']:
+            if entry['subscription_id']:
+                domain_id = self.osa.add_subdomain(entry['subscription_id'], entry['domain'],
+                    entry['prefix'])
+            else:
+                domain_id = self.osa.add_provider_subdomain(entry['domain'], entry['prefix'])
+        else:
+            domain_id = self.osa.add_domain(entry['account_id'], entry['domain'])
+        if entry['dns_hosting']:
+            self.osa.add_dns_hosting(entry_name(entry), self.dns_rt_id)
+        return domain_id
+
+    def run(self, entries):
+        """Process entries
+
+        :param entries: iterable of entries, e.g. read_entries(path)
+        :returns: {'done': n, 'failed': n, 'skipped': n}
+        """
+        done = self.done_names()
+        counts = {'done': 0, 'failed': 0, 'skipped': 0}
+        # bounds entries read ahead of the workers
+        slots = threading.Semaphore(self.workers * 2)
+        pool = ThreadPool(self.workers)
+        results = open(self.results_file, 'a')
+        try:
+            for entry in entries:
+                name = entry_name(entry)
+                if name in done:
+                    counts['skipped'] += 1
+                    continue
+                slots.acquire()
+                future = Future(name)
+                with self.pending_lock:
+                    parent = self.pending.get(entry['domain']) if entry['prefix'] else None
+                    previous = self.pending.get(name)
+                    self.pending[name] = future
+                # workers take entries in order, so entries waited for are taken earlier
+                pool.apply_async(self._process,
+                    (entry, results, counts, slots, future, parent, previous))
+        finally:
+            pool.close()
+            pool.join()
+            results.close()
+        return counts
+
+    def _process(self, entry, results, counts, slots, future, parent=None, previous=None):
+        """
+        :param future: Future of the entry, finished when it is processed
+        :param parent: Future of the domain of the subdomain entry, if it is processed
+        :param previous: Future of the previous entry of the same name, if it is processed
+        """
+        result = {'name': entry_name(entry), 'domain_id': None, 'error': None}
+        try:
+            if previous is not None:
+                previous.wait()
+            if parent is not None and parent.exception() is not None:
+                raise OSAError("Domain {0} failed: {1}".format(parent.name, parent.exception()))
+            result['domain_id'] = self.add(entry)
+            result['status'] = 'done'
+        except Exception as err:
+            result.update(status='failed', error=str(err))
+        finally:
+            slots.release()
+        with self.write_lock:
+            results.write(json.dumps(result) + '\n')
+            results.flush()
+            counts[result['status']] += 1
+        with self.pending_lock:
+            if self.pending.get(future.name) is future:
+                del self.pending[future.name]
+        if result['status'] == 'done':
+            future.set_result(result['domain_id'])
+        else:
+            future.set_exception(OSAError(result['error']))
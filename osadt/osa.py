@@ -1,21 +1,24 @@
 import time
+import logging
 import urllib2
 import xmlrpclib
-import subprocess
-
-from poaupdater import openapi
-from poaupdater import uPackaging
-from poaupdater import uSysDB
-from poaupdater.openapi import OpenAPIError
-
-import poaupdater.uLogging
-from poaupdater.uConfig import *
-poaupdater.uLogging.log_to_console = False
-poaupdater.uLogging.logfile = open('poaupdater.log', 'w')
-
-class OSAError(Exception):
-    pass
-
+import threading
+from multiprocessing.pool import ThreadPool
+
+from errors import OSAError
+from cache import DomainCache, HostInventory, ResourceTypeCatalog
+from db import ConnectionPool, SystemDB
+from futures import FOREVER, Future, gather
+from governor import Governor
+from licenses import LicenseCache
+from logs import LazyFile
+from runner import CommandRunner
+from transport import install_keep_alive, multicall
+from timeouts import AdaptiveTimeouts
+from tracker import RequestTracker
+import tracing
+
+log = logging.getLogger('osadt.osa')
 
 class OSA:
 
@@ -24,70 +27,338 @@ class OSA:
     install_package_timeout = 300
     add_dns_hosting_timeout = 330
     check_period = 5
-
-    def __init__(self, cp_login='admin', cp_password=None, cp_url='http://127.0.0.1:8080/'):
-        config = Config()
-        openapi.initFromEnv(config)
-        self.api = openapi.OpenAPI()
+    # {method: seconds} timeouts used instead of the learned and default ones
+    timeout_overrides = {}
+    register_workers = 4
+    dns_workers = 8
+    package_workers = 8
+    submit_workers = 8
+    host_workers = 8
+    # max requests of a method running at once and calls of it per second, see Governor
+    api_limits = {'pem.registerSharedNode': 4, 'pem.packaging.installPackageSync': 8}
+    api_rates = {}
+    # installs httpd and mod_ssl to UI node, formatted with host_id
+    install_hcl_cmd = ("/usr/local/pem/bin/pleskd_ctl -f /usr/local/pem/etc/pleskd.props"
+        " processHCL install.hcl {host_id}")
+
+    def __init__(self, cp_login='admin', cp_password=None, cp_url='http://127.0.0.1:8080/',
+        tracer=None, keep_alive=False, api_limits=None, api_rates=None, poll_db=False,
+        durations_file=None, timeout_overrides=None, adaptive_timeouts=True,
+        log_file='poaupdater.log', request_status_query=None):
+        """
+        :param tracer: tracing.Tracer recording API calls, tracing.tracer by default
+        :param keep_alive: keep HTTP connection to OpenAPI open between calls
+        :param api_limits, api_rates: override class defaults, see Governor
+        :param poll_db: check request statuses in system database, see db_request_statuses()
+        :param request_status_query: see SystemDB.request_status_query, required by poll_db
+        :param durations_file: keep durations of requests between runs, see AdaptiveTimeouts
+        :param timeout_overrides: override class default, see AdaptiveTimeouts
+        :param adaptive_timeouts: if False, only record durations, use the fixed timeouts
+        :param log_file: poaupdater log, appended, opened on the first write
+
+        OpenAPI is connected on the first call.
+        :raises OSAError: if poll_db is set without request_status_query
+        """
+        # poaupdater is imported when OSA is used, osadt command works without it otherwise
+        from poaupdater import uLogging
+        self.tracer = tracer or tracing.tracer
+        uLogging.log_to_console = False
+        uLogging.logfile = LazyFile(log_file)
+        self.keep_alive = keep_alive
+        self._api = None
+        # None - not known yet if OpenAPI supports system.multicall
+        self.multicall_supported = None
+        # OpenAPI keeps one open request per connection, serialize access to it
+        self.api_lock = threading.RLock()
+        self.governor = Governor(self.api_limits if api_limits is None else api_limits,
+            self.api_rates if api_rates is None else api_rates)
+        # waits for all outstanding requests together
+        self.poll_db = poll_db
+        # requests missing in the query result are polled with API, warned once
+        self.missing_statuses_warned = False
+        self.timeouts = AdaptiveTimeouts(durations_file, self.timeout_overrides
+            if timeout_overrides is None else timeout_overrides, adaptive_timeouts)
+        self.tracker = RequestTracker(self.request_statuses, self.check_period,
+            on_finish=self._request_finished)
+        self.submit_pool = None
+        self.hosts = HostInventory(self.get_hosts)
+        self.rts = ResourceTypeCatalog(self.get_resource_types)
+        self.domains = DomainCache(self._lookup_domain, self._lookup_domains)
+        self.db = SystemDB(ConnectionPool(tracer=self.tracer), request_status_query)
+        if poll_db and not self.db.request_status_query:
+            raise OSAError("poll_db is set, but request_status_query is not")
+        # uPackaging is not known to be thread safe, its lookups are quick anyway
+        self.packaging_lock = threading.Lock()
+        self.suitable_packages = {}
+        self.runner = CommandRunner(tracer=self.tracer)
         self.cp_login = cp_login
         self.cp_password = cp_password
         self.cp_url = cp_url
 
-    @staticmethod
-    def install_updates(install_updates_cmd):
-        check = ""
-        while check != "ignore":
-            try:
-                check = ""
-                subprocess.check_call(install_updates_cmd, shell=True)
-                break
-            except subprocess.CalledProcessError as e:
-                print("Install updates command: {}; failed with output {}".format(install_updates_cmd, e.output))
-                while check not in {'retry', 'abort', 'ignore'}:
-                    check = raw_input("Update installation failed, retry/abort/ignore: ")
-                if check == "retry" or check == "ignore":
-                    pass
-                if check == "abort":
-                    exit(1)
+    @property
+    def api(self):
+        """OpenAPI connection, set up on the first use"""
+        if self._api is None:
+            with self.api_lock:
+                if self._api is None:
+                    from poaupdater import openapi
+                    from poaupdater.uConfig import Config
+                    config = Config()
+                    openapi.initFromEnv(config)
+                    api = openapi.OpenAPI()
+                    if self.keep_alive:
+                        install_keep_alive(api.server)
+                    self._api = api
+        return self._api
+
+    def install_updates(self, install_updates_cmd, background=False):
+        """Run updates installer, see CommandRunner for timeout and retries
+
+        :param background: do not wait, return Future
+        :returns: True, False if failure was ignored
+        :raises OSAError: when installation failed
+        """
+        if background:
+            return self.runner.run_background(install_updates_cmd, "Update installation")
+        return self.runner.run(install_updates_cmd, "Update installation")
 
     def api_async_call(self, methodname, **kwargs):
         """Run async api call
 
+        Waits if the call is over governor limits, the request is counted as
+        running only till the call returns.
         :returns: (request_id, response)
         """
-        #TODO lock api until commit
-        method = getattr(self.api, methodname)
-        request_id = self.api.beginRequest()
-        result = method(**kwargs)
-        self.api.commit()
+        governor_wait = self.governor.acquire(methodname)
+        try:
+            return self._api_async_call(methodname, kwargs, governor_wait)
+        finally:
+            self.governor.release(methodname)
+
+    def _api_async_call(self, methodname, kwargs, governor_wait=0):
+        queued = time.time()
+        with self.tracer.span('api', methodname, self._trace_args(kwargs)) as args:
+            if governor_wait:
+                args['governor_wait'] = governor_wait
+            with self.api_lock:
+                args['lock_wait'] = time.time() - queued
+                method = getattr(self.api, methodname)
+                request_id = self.api.beginRequest()
+                args['request_id'] = request_id
+                result = method(**kwargs)
+                self.api.commit()
         return request_id, result
 
+    @staticmethod
+    def _trace_args(kwargs):
+        """Arguments of api call worth recording in trace"""
+        return dict( (name, kwargs[name]) for name in
+            ('host', 'host_id', 'domain_name', 'name', 'pname') if name in kwargs )
+
+    def _request_finished(self, request, error):
+        """Record finished request in trace and its duration, called by tracker"""
+        if error is None:
+            self.timeouts.record(request.methodname, request.kwargs,
+                time.time() - request.start_time)
+        elif request.timed_out:
+            self.timeouts.timed_out(request.methodname, request.kwargs)
+        self._trace_request(request, error)
+
+    def _trace_request(self, request, error):
+        """Record finished request in trace"""
+        self.tracer.record('request', request.methodname, request.start_time,
+            outcome='ok' if error is None else str(error),
+            tid='request {0}'.format(request.request_id),
+            args=dict(self._trace_args(request.kwargs),
+                request_id=request.request_id, polls=request.polls))
+
     def api_async_call_wait(self, methodname, timeout=None, **kwargs):
         """Run async api call and wait till execution
 
         :returns: response from api call
         :raises OSAError: in case of timeout or API call failure
         """
-        timeout = timeout or self.api_sync_timeout
-        start_time = time.time()
-        request_id, result = self.api_async_call(methodname, **kwargs)
-        while True:
-            status = self.api.pem.getRequestStatus(request_id=request_id)
-            if status['request_status'] == 0:
-                return result
-            elif status['request_status'] == 2:
-                raise OSAError("Failure while executing {0} with args {1}, status: {2}"
-                    .format(methodname, kwargs, status))
-            if time.time() - start_time > timeout:
-                raise OSAError("Timeout ({2}) while executing {0} with args {1}"
-                    .format(methodname, kwargs, timeout))
-            time.sleep(self.check_period)
+        return self.api_async_call_future(methodname, timeout, **kwargs).result()
+
+    def api_async_call_future(self, methodname, timeout=None, **kwargs):
+        """Run async api call, do not wait till execution
+
+        Timeout and the first status check are adapted to durations of the
+        previous requests, see AdaptiveTimeouts.
+        :param timeout: default timeout, api_sync_timeout by default
+        :returns: Future, its result() returns response from api call
+            and raises OSAError in case of timeout or API call failure
+        """
+        timeout = self.timeouts.timeout(methodname, kwargs, timeout or self.api_sync_timeout)
+        first_check = self.timeouts.first_check(methodname, kwargs, self.tracker.first_check,
+            self.check_period)
+        # the request is counted by governor till its task is finished
+        governor_wait = self.governor.acquire(methodname)
+        try:
+            request_id, result = self._api_async_call(methodname, kwargs, governor_wait)
+        except BaseException:
+            self.governor.release(methodname)
+            raise
+        future = self.tracker.track(request_id, methodname, kwargs, result, timeout,
+            first_check)
+        future.add_done_callback(lambda future: self.governor.release(methodname))
+        return future
+
+    def submit(self, method, *args, **kwargs):
+        """Run any method in background
+
+        Example:
+            f1 = osa.submit('install_package', host_id, 'PrivacyProxy', 'service')
+            f2 = osa.submit(osa.add_dns_record, 'prov.tld', 'ns1', 'A', ip)
+            gather([f1, f2])
+        :param method: name of OSA method or callable
+        :returns: Future
+        """
+        if isinstance(method, basestring):
+            method = getattr(self, method)
+        future = Future(getattr(method, '__name__', str(method)))
+        with self.api_lock:
+            if self.submit_pool is None:
+                self.submit_pool = ThreadPool(self.submit_workers)
+        self.submit_pool.apply_async(self._run_submitted, (future, method, args, kwargs))
+        return future
+
+    @staticmethod
+    def _run_submitted(future, method, args, kwargs):
+        try:
+            future.set_result(method(*args, **kwargs))
+        except Exception as err:
+            future.set_exception(err)
+
+    @staticmethod
+    def run_concurrently(func, items, workers):
+        """Call func(item) for every item in a thread pool
+
+        :param workers: max number of concurrent calls
+        :returns: [(True, result) or (False, exception), ..] in the order of items
+        """
+        def call(item):
+            try:
+                return True, func(item)
+            except Exception as err:
+                return False, err
+        items = list(items)
+        if not items:
+            return []
+        pool = ThreadPool(min(workers, len(items)))
+        try:
+            return pool.map_async(call, items, chunksize=1).get(FOREVER)
+        finally:
+            pool.close()
+            pool.join()
+
+    def request_statuses(self, request_ids):
+        """Get status of several api requests, polled by tracker
+
+        From system database if poll_db is set, otherwise with API calls.
+        Requests the query returns no rows for are checked with API calls.
+        If the database query fails, API is used from then on.
+        :returns: {request_id: pem.getRequestStatus response, ..}
+        """
+        if self.poll_db:
+            try:
+                statuses = self.db_request_statuses(request_ids)
+            except Exception as err:
+                log.warning("Request status query failed, polling API instead: %s", err)
+                self.poll_db = False
+            else:
+                missing = [ request_id for request_id in request_ids
+                    if request_id not in statuses ]
+                if missing:
+                    if not self.missing_statuses_warned:
+                        log.warning("Request status query returned no rows for %d of %d "
+                            "requests, e.g. %s, polling them with API", len(missing),
+                            len(request_ids), missing[0])
+                        self.missing_statuses_warned = True
+                    statuses.update(self.api_request_statuses(missing))
+                return statuses
+        return self.api_request_statuses(request_ids)
+
+    def db_request_statuses(self, request_ids):
+        """Get status of several api requests with one query, see SystemDB.request_status_query
+
+        :returns: {request_id: {'request_status': status}, ..}, requests not found are missing
+        """
+        return dict( (request_id, {'request_status': status}) for request_id, status in
+            self.db.get_request_statuses(request_ids).items() )
+
+    def api_request_statuses(self, request_ids):
+        """Get status of several api requests
+
+        :returns: {request_id: pem.getRequestStatus response, ..},
+            requests which could not be checked are missing
+        """
+        statuses = {}
+        errors = []
+        with self.tracer.span('poll', 'pem.getRequestStatus', {'requests': len(request_ids)}):
+            for request_id in request_ids:
+                try:
+                    with self.api_lock:
+                        statuses[request_id] = self.api.pem.getRequestStatus(
+                            request_id=request_id)
+                except Exception as err:
+                    # checked again by tracker till the request times out
+                    errors.append((request_id, err))
+        if errors:
+            log.warning("Status check of %d of %d requests failed, e.g. %s: %s", len(errors),
+                len(request_ids), errors[0][0], errors[0][1])
+        return statuses
+
+    def api_batch(self, calls):
+        """Run independent read-only api calls in one HTTP request
+
+        Calls are made out of request, so they must not change anything.
+        system.multicall is used if OpenAPI supports it, otherwise calls are made one by one.
+        Example osa.api_batch([('pem.getDomainByName', {'domain_name': 'prov.tld'}),
+            ('pem.getProvisioningAttributes', {})])
+        :param calls: [(methodname, kwargs), ..]
+        :returns: [response or exception, ..] in the order of calls
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        with self.tracer.span('api', 'system.multicall', {'calls': len(calls)}):
+            with self.api_lock:
+                if self.multicall_supported is not False:
+                    raw = multicall(self.api.server, calls)
+                    self.multicall_supported = raw is not None
+                if not self.multicall_supported:
+                    raw = []
+                    for methodname, kwargs in calls:
+                        try:
+                            raw.append(getattr(self.api.server, methodname)(kwargs))
+                        except xmlrpclib.Fault as err:
+                            raw.append(err)
+        return [ self._api_response(res) for res in raw ]
+
+    @staticmethod
+    def _api_response(res):
+        """Turn raw OpenAPI response into result or exception"""
+        from poaupdater.openapi import OpenAPIError
+        if isinstance(res, Exception):
+            return OSAError(str(res))
+        if not isinstance(res, dict) or res.get('status', 0) == 0:
+            return res.get('result') if isinstance(res, dict) else res
+        # OSA only relies on these attributes of OpenAPIError
+        err = OpenAPIError.__new__(OpenAPIError)
+        Exception.__init__(err, res.get('error_message'))
+        err.error_message = res.get('error_message')
+        err.module_id = res.get('module_id')
+        err.extype_id = res.get('extype_id')
+        err.properties = res.get('properties') or {}
+        return err
 
     def api_getMethodSignature(self, method_name):
-        method = getattr(self.api.server,'pem.getMethodSignature')
-        return method({ 'method_name' : method_name }).get('signature', None)
+        with self.api_lock:
+            method = getattr(self.api.server,'pem.getMethodSignature')
+            return method({ 'method_name' : method_name }).get('signature', None)
 
-    def upload_license(self, url=None, filename=None, lic=None):
+    def upload_license(self, url=None, filename=None, lic=None, cache_dir=None):
         """Upload license
 
         Either url or filename or lic should be set
@@ -95,23 +366,46 @@ class OSA:
         :param url: URL from which license can be downloaded
         :param filename: path to the license file
         :param lic: license
-        :returns: nothing
+        :param cache_dir: directory to keep downloaded license and hash of the uploaded one,
+            license is downloaded only if modified and uploaded only if changed
+        :returns: True if license was uploaded, False if it is the same as uploaded last time
         :raises OSAError: in case of wrong creds
         """
-        if not (url or filename or data):
+        if not (url or filename or lic):
             raise OSAError("No url or filename or lic were passed")
+        cache = LicenseCache(cache_dir) if cache_dir else None
         if url:
-            lic = urllib2.urlopen(url).read()
+            if cache:
+                lic = cache.fetch(url)
+            else:
+                lic = urllib2.urlopen(url).read()
         elif filename:
             with open(filename, "r") as f:
                 lic = f.read()
+        if cache and cache.is_active(lic):
+            return False
         self.api_async_call_wait('pem.uploadLicense', license=xmlrpclib.Binary(lic))
+        if cache:
+            cache.set_active(lic)
+        return True
 
     def get_domain(self, name):
-        """Find domain by name
+        """Find domain by name, see DomainCache
 
         :returns: tuple (domain_id, owner_id)
         """
+        return self.domains.get(name)
+
+    def get_domains(self, names):
+        """Find several domains by name, the ones not in DomainCache in one batch
+
+        :returns: {name: (domain_id, owner_id), ..}, (None, None) for missing domains
+        :raises OpenAPIError: on errors other than missing domain
+        """
+        return self.domains.get_many(names)
+
+    def _lookup_domain(self, name):
+        from poaupdater.openapi import OpenAPIError
         try:
             res = self.api_async_call_wait('pem.getDomainByName', domain_name=name)
         except OpenAPIError as err:
@@ -123,6 +417,22 @@ class OSA:
         else:  # domain found
             return res['domain_id'], res['owner_id']
 
+    def _lookup_domains(self, names):
+        """Find several domains by name in one batch, see api_batch()"""
+        from poaupdater.openapi import OpenAPIError
+        names = list(names)
+        results = self.api_batch([ ('pem.getDomainByName', {'domain_name': name})
+            for name in names ])
+        domains = {}
+        for name, res in zip(names, results):
+            if isinstance(res, OpenAPIError) and res.module_id == 'dns' and res.extype_id == 10:
+                domains[name] = (None, None)
+            elif isinstance(res, Exception):
+                raise res
+            else:
+                domains[name] = (res['domain_id'], res['owner_id'])
+        return domains
+
     def add_domain(self, acc_id, name):
         """Add domain without hosting
 
@@ -141,6 +451,7 @@ class OSA:
         else:  # no such domain, create
             res = self.api_async_call_wait('pem.addDomainToAccount',
                 account_id=acc_id, domain_name=name)
+            self.domains.add(name, res['domain_id'], acc_id)
             return res['domain_id']
 
     def add_provider_domain(self, name):
@@ -173,6 +484,8 @@ class OSA:
         else:  # no subdomain, create
             res = self.api_async_call_wait('pem.addSubdomain',
                 subscription_id=sub_id, domain_name=domain, prefix=prefix)
+            # owner is not known without one more call, look it up when needed
+            self.domains.invalidate(subdomain)
             return res['domain_id']
 
     def add_provider_subdomain(self, domain, prefix):
@@ -189,6 +502,7 @@ class OSA:
         Reenterable
         :returns: node id
         """
+        from poaupdater.openapi import OpenAPIError
         shared_ip = frontnet or backnet
         net_conf = {'communication_ip': backnet, 'shared_ip': shared_ip}
         _role_params = None
@@ -203,11 +517,70 @@ class OSA:
         except OpenAPIError as err:
             # node is registered already?
             if err.module_id == 'SharedNodeRegistrator' and err.extype_id == 13:
-                host = self.api_async_call_wait('pem.getHosts',ip_address=backnet)
                 return int(self.get_hostid_by_ip(backnet))
             else:
                 raise
-        return res.get('host_id')
+        host_id = res.get('host_id')
+        self.hosts.add(host_id, [backnet, frontnet], new_hostname)
+        return host_id
+
+    def register_nodes(self, nodes, workers=None):
+        """Register several nodes concurrently
+
+        Each node is a dict of register_node() arguments, follow-ups of the node are
+        run as soon as it is registered.
+
+        Example osa.register_nodes({'ns1': {'register': osa.register_dns,
+            'backnet': ip, 'login': login, 'password': password, 'frontnet': fip}})
+        Reenterable
+        :param nodes: {name: node, ..}
+        :param workers: number of nodes registered at once, register_workers by default
+        :returns: {name: host_id, ..}
+        :raises OSAError: when some nodes failed, after the rest are finished
+        """
+        if not nodes:
+            return {}
+        pool = ThreadPool(min(workers or self.register_workers, len(nodes)))
+        try:
+            jobs = dict( (name, pool.apply_async(self.register_node, (), node))
+                for name, node in nodes.items() )
+            host_ids = {}
+            errors = []
+            for name, job in jobs.items():
+                try:
+                    host_ids[name] = job.get(FOREVER)
+                except Exception as err:
+                    errors.append("{0} ({1}): {2}".format(name, nodes[name].get('backnet'), err))
+        except BaseException:
+            # e.g. Ctrl-C, do not wait for registrations in progress
+            pool.terminate()
+            raise
+        pool.close()
+        pool.join()
+        if errors:
+            raise OSAError("Failed to register nodes: " + "; ".join(errors))
+        return host_ids
+
+    def register_node(self, register=None, attrs=None, packages=None, ready=False, **params):
+        """Register node and configure it
+
+        Reenterable
+        :param register: method to use instead of register_shared_node, e.g. register_dns
+        :param attrs: provisioning attributes to set
+        :param packages: packages to install, see install_packages()
+        :param ready: set host ready to provide
+        :param params: arguments of the register method
+        :returns: host_id
+        """
+        register = register or self.register_shared_node
+        host_id = register(**params)
+        if attrs:
+            self.set_host_attrs(host_id, *attrs)
+        if packages:
+            self.install_packages(host_id, packages)
+        if ready:
+            self.set_host_ready(host_id)
+        return host_id
 
     def install_package(self, host_id, name, ctype, properties=None):
         """Install package to host
@@ -216,13 +589,15 @@ class OSA:
         :param ctype: is one of service, sc, cp, other
         :returns: component_id
         """
+        from poaupdater import uPackaging
         try:  # check if already installed
-            component_id, version = uPackaging.findHostComponentId(host_id, name, ctype)
+            with self.packaging_lock:
+                component_id, version = uPackaging.findHostComponentId(host_id, name, ctype)
         except uPackaging.ComponentNotFound:
             pass
         else:
             return component_id
-        pkg_id, version = uPackaging.findSuitablePackage(host_id, name, ctype)
+        pkg_id, version = self.find_suitable_package(host_id, name, ctype)
         if properties is None:
             proplist = []
         else:
@@ -233,13 +608,64 @@ class OSA:
             host_id=host_id, package_id=pkg_id, properties=proplist)
         return res.get('component_id')
 
-    def install_packages(self, host_id, packages):
+    def find_suitable_package(self, host_id, name, ctype):
+        """Find package suitable for the host
+
+        Results are cached by package name, type and host platform.
+        :returns: (package_id, version)
+        """
+        from poaupdater import uPackaging
+        platform_id = self.db.get_host_platform(host_id)
+        key = (name, ctype, platform_id)
+        with self.packaging_lock:
+            if platform_id is None:  # can not tell which hosts share the result
+                return uPackaging.findSuitablePackage(host_id, name, ctype)
+            if key not in self.suitable_packages:
+                self.suitable_packages[key] = uPackaging.findSuitablePackage(host_id, name, ctype)
+            return self.suitable_packages[key]
+
+    def install_packages(self, host_id, packages, workers=1):
         """Install multiple packages to the host
 
         :param packages: list of: [ { 'name': name, 'ctype': ctype, 'properties': properties }, ..]
+        :param workers: number of packages installed at once,
+            keep 1 if packages depend on each other - they are installed in the order then
+        :raises OSAError: when some packages failed, after the rest are finished
         """
-        for package in packages:
-            self.install_package(host_id, **package)
+        if workers == 1:
+            for package in packages:
+                self.install_package(host_id, **package)
+            return
+        done = self.run_concurrently(lambda package: self.install_package(host_id, **package),
+            packages, workers)
+        errors = [ "{0}: {1}".format(package['name'], value)
+            for package, (ok, value) in zip(packages, done) if not ok ]
+        if errors:
+            raise OSAError("Failed to install packages to host {0}: {1}"
+                .format(host_id, "; ".join(errors)))
+
+    def install_package_to_hosts(self, host_ids, name, ctype, properties=None, workers=None):
+        """Install package to many hosts concurrently
+
+        Reenterable
+        :param workers: number of hosts installed at once, package_workers by default
+        :returns: {host_id: component_id, ..}
+        :raises OSAError: when some hosts failed, after the rest are finished
+        """
+        host_ids = list(host_ids)
+        done = self.run_concurrently(
+            lambda host_id: self.install_package(host_id, name, ctype, properties),
+            host_ids, workers or self.package_workers)
+        component_ids = {}
+        errors = []
+        for host_id, (ok, value) in zip(host_ids, done):
+            if ok:
+                component_ids[host_id] = value
+            else:
+                errors.append("{0}: {1}".format(host_id, value))
+        if errors:
+            raise OSAError("Failed to install {0} to hosts: {1}".format(name, "; ".join(errors)))
+        return component_ids
 
     def set_host_attrs(self, host_id, *attrs):
         """Set provisioning attributes for the host"""
@@ -254,15 +680,84 @@ class OSA:
         self.api_async_call_wait('pem.setHostReadyToProvide',
             host_id=host_id, ready_to_provide=ready)
 
-    def create_attrs_w_d(self, attrs):
+    def _resolve_host(self, host):
+        """
+        :param host: host_id, IP address or hostname
+        :returns: host_id
+        :raises OSAError: when host is not found
+        """
+        if isinstance(host, (int, long)):
+            return host
+        host_id = self.hosts.get_by_ip(host)
+        if host_id is None:
+            host_id = self.hosts.get_by_name(host)
+        if host_id is None:
+            raise OSAError("Host {0} not found".format(host))
+        return host_id
+
+    def configure_hosts(self, hosts, attrs=None, ready=None, create_attrs=True, workers=None):
+        """Set provisioning attributes and readiness of many hosts concurrently
+
+        Attributes missing in the catalog are created once for all hosts.
+        Example osa.configure_hosts(['10.0.0.1', 'ns2.prov.tld', 1234], ['branding'], ready=True)
+        Reenterable
+        :param hosts: host_ids, IP addresses or hostnames
+        :param attrs: provisioning attributes to set, as set_host_attrs() does
+        :param ready: True or False to set or unset ready to provide, None to leave as is
+        :param create_attrs: create missing attributes, otherwise fail on them
+        :param workers: max number of hosts configured at once, host_workers by default
+        :returns: [{'host': .., 'host_id': .., 'status': 'done' | 'failed', 'error': ..}, ..]
+            in the order of hosts
+        :raises OSAError: when attributes are missing and create_attrs is False
+        """
+        hosts = list(hosts)
+        if attrs:
+            existing = set(self.get_attrs())
+            missing = [ name for name in attrs if name not in existing ]
+            if missing and not create_attrs:
+                raise OSAError("Provisioning attributes not found: " + ", ".join(missing))
+            self.create_attrs_w_d(dict( (name, '') for name in missing ), existing=existing)
+        def configure(host):
+            host_id = self._resolve_host(host)
+            if attrs:
+                self.set_host_attrs(host_id, *attrs)
+            if ready is not None:
+                self.set_host_ready(host_id, ready)
+            return host_id
+        done = self.run_concurrently(configure, hosts, workers or self.host_workers)
+        results = []
+        for host, (ok, value) in zip(hosts, done):
+            if ok:
+                results.append({'host': host, 'host_id': value, 'status': 'done', 'error': None})
+            else:
+                results.append({'host': host, 'host_id': None, 'status': 'failed', 'error': value})
+        return results
+
+    def set_hosts_attrs(self, hosts, *attrs, **kwargs):
+        """Set provisioning attributes for many hosts, see configure_hosts()"""
+        return self.configure_hosts(hosts, attrs, **kwargs)
+
+    def set_hosts_ready(self, hosts, ready=True, workers=None):
+        """Set many hosts ready to provide, see configure_hosts()"""
+        return self.configure_hosts(hosts, ready=ready, workers=workers)
+
+    def get_attrs(self):
+        """Get names of all provisioning attributes"""
+        res = self.api_async_call_wait('pem.getProvisioningAttributes')
+        return [ a['name'] for a in res ]
+
+    def create_attrs_w_d(self, attrs, existing=None):
         """Create provisioning attributes with descriptions.
 
         Example osa.create_attrs_w_d({'attr1': 'descr1', 'attr2': 'descr2', ..})
         Reenterable
+        :param existing: names of existing attributes if known, fetched otherwise
         """
+        if not attrs:
+            return
         # filter existing attrs
-        res = self.api_async_call_wait('pem.getProvisioningAttributes')
-        existing = [ a['name'] for a in res ]
+        if existing is None:
+            existing = self.get_attrs()
         _attrs = [ {'name': name, 'descr': descr}
             for (name, descr) in attrs.items() if not name in existing ]
         if not _attrs:
@@ -278,23 +773,22 @@ class OSA:
         _attrs = dict( (name, '') for name in attrs )
         self.create_attrs_w_d(_attrs)
 
+    def get_resource_types(self, **kwargs):
+        """Get resource types including system ones
+
+        :param kwargs: pem.getResourceTypesByClass filter, resclass_name or friendly_name
+        :returns: pem.getResourceTypesByClass response
+        """
+        return self.api_async_call_wait('pem.getResourceTypesByClass',
+            show_system_rt=True, **kwargs)
+
     def get_rt_id(self, rt_name, rt_class):
-        """Find resource type
+        """Find resource type using resource type catalog cache
 
+        :param rt_class: class name or class friendly name
         :returns: rt_id of the first found
         """
-        res = self.api_async_call_wait('pem.getResourceTypesByClass',
-            resclass_name=rt_class, show_system_rt=True)
-        for rt in res:
-            if rt['resource_type_name'] == rt_name:
-                return rt['resource_type_id']
-        # not found? search by class friendly name
-        res = self.api_async_call_wait('pem.getResourceTypesByClass',
-            friendly_name=rt_class, show_system_rt=True)
-        for rt in res:
-            if rt['resource_type_name'] == rt_name:
-                return rt['resource_type_id']
-        return None
+        return self.rts.get(rt_name, rt_class)
 
     def set_rt_attrs(self, rt_id, *attrs):
         """Set provisioning attributes for the resource type"""
@@ -319,7 +813,9 @@ class OSA:
         res = self.api_async_call_wait('pem.addResourceType',
             resclass_name=rt_class, name=rt_name,
             attrs=_attrs, act_params=act_params)
-        return res.get('resource_type_id')
+        rt_id = res.get('resource_type_id')
+        self.rts.add(rt_name, rt_class, rt_id)
+        return rt_id
 
     def create_dns_rt(self, *ns_hostnames):
         """Create DNS Hosting Resource Type
@@ -347,6 +843,7 @@ class OSA:
         :param dns_rt_id: rt_id of dns hosting resource, optional
         :param dns_rt_name: name of dns hosting resource, predefined
         """
+        from poaupdater.openapi import OpenAPIError
         dom_id, owner_id = self.get_domain(domain)
         if not dns_rt_id:
             dns_rt_id = self.get_rt_id(dns_rt_name, 'DNS Hosting')
@@ -366,6 +863,7 @@ class OSA:
 
         :returns: DNS record_id
         """
+        from poaupdater.openapi import OpenAPIError
         try:
             res = self.api_async_call_wait('pem.createDNSRecord',
                 timeout=self.add_dns_hosting_timeout,
@@ -378,6 +876,43 @@ class OSA:
             else:
                 raise
 
+    def add_dns_records(self, records, workers=None):
+        """Create many DNS resource records concurrently
+
+        Duplicates in records are created once and get the same result.
+        Example osa.add_dns_records([('prov.tld', 'ns1', 'A', ip1),
+            {'domain': 'prov.tld', 'host': 'www', 'type': 'CNAME', 'data': 'prov.tld.'}])
+        Reenterable
+        :param records: iterable of (domain, host, type, data) or dicts with the same keys
+        :param workers: max number of records created at once, dns_workers by default
+        :returns: [{'domain': .., 'host': .., 'type': .., 'data': ..,
+            'status': 'created' | 'exists' | 'failed', 'record_id': .., 'error': ..}, ..]
+            in the order of records
+        """
+        records = [ tuple(record) if not isinstance(record, dict) else
+            (record['domain'], record['host'], record['type'], record['data'])
+            for record in records ]
+        unique = []
+        seen = set()
+        for record in records:
+            if record not in seen:
+                seen.add(record)
+                unique.append(record)
+        done = self.run_concurrently(lambda record: self.add_dns_record(*record),
+            unique, workers or self.dns_workers)
+        results = {}
+        for (domain, host, type, data), (ok, value) in zip(unique, done):
+            result = {'domain': domain, 'host': host, 'type': type, 'data': data,
+                'record_id': None, 'error': None}
+            if not ok:
+                result.update(status='failed', error=value)
+            elif value == 0:  # already added
+                result.update(status='exists')
+            else:
+                result.update(status='created', record_id=value)
+            results[(domain, host, type, data)] = result
+        return [ dict(results[record]) for record in records ]
+
     def create_brand_web_rt(self, provdomain,
         rt_name='Shared hosting Apache (branding)',
         brand_attr='branding'):
@@ -404,33 +939,37 @@ class OSA:
 
         host_id = self.register_shared_node(backnet,login,password,frontnet)
         # need to install httpd and mod_ssl manually on the target host.
-        install_cmd = "/usr/local/pem/bin/pleskd_ctl -f /usr/local/pem/etc/pleskd.props processHCL install.hcl " + str(host_id)
-        check = ""
-        while check != "ignore":
-            try:
-                check = ""
-                subprocess.check_call(install_cmd, shell=True)
-                break
-            except subprocess.CalledProcessError as e:
-                print("Installation of httpd/mod_ssl: {}; failed with output {}".format(install_cmd, e.output))
-                while check not in {'retry', 'abort', 'ignore'}:
-                    check = raw_input("retry/abort/ignore: ")
-                if check == "retry" or check == "ignore":
-                    pass
-                if check == "abort":
-                    exit(1)
-
-        self.api_async_call('pem.packaging.installPackageByName',host_id=host_id,pname='pau-jboss', ptype='other')
-        self.api_async_call('pem.packaging.installPackageByName',host_id=host_id,pname='branding', ptype='other')
+        install_cmd = self.install_hcl_cmd.format(host_id=host_id)
+        self.runner.run(install_cmd, "Installation of httpd/mod_ssl to host {0}".format(host_id))
+        # both packages are installed at once
+        gather([ self.api_async_call_future('pem.packaging.installPackageByName',
+                timeout=self.install_package_timeout, host_id=host_id, pname=pname, ptype='other')
+            for pname in ('pau-jboss', 'branding') ])
         return host_id
 
-    def get_hostid_by_ip(self,backnet):
-        hosts = self.api_async_call_wait('pem.getHosts')
-        for h in hosts:
-            ips = [ ip['ip_address'] for ip in h['ip_addresses'] ]
-            if backnet in ips:
-                return h['host_id']
-        return -1
+    def get_hosts(self, **kwargs):
+        """Get hosts
+
+        :param kwargs: pem.getHosts filter, e.g. ip_address
+        :returns: pem.getHosts response
+        """
+        return self.api_async_call_wait('pem.getHosts', **kwargs)
+
+    def get_hostid_by_ip(self, backnet):
+        """Find host by IP address using host inventory cache
+
+        :returns: host_id or -1
+        """
+        host_id = self.hosts.get_by_ip(backnet)
+        return -1 if host_id is None else host_id
+
+    def get_hostid_by_name(self, hostname):
+        """Find host by hostname using host inventory cache
+
+        :returns: host_id or -1
+        """
+        host_id = self.hosts.get_by_name(hostname)
+        return -1 if host_id is None else host_id
 
     def add_ui(self, cluster_id):
         """Add UI service to NG cluster
@@ -492,15 +1031,7 @@ class OSA:
 
         :returns: pool_id
         """
-        con = uSysDB.connect()
-        cur = con.cursor()
-        cur.execute("SELECT pool_id, pool_name FROM ip_pools")
-        pools = cur.fetchall()
-        con.close()
-        for pool in pools:
-            if name == pool[1]:
-                return pool[0]
-        return None
+        return self.db.get_ip_pool_id(name)
 
     def create_ip_pool(self, name, start, end, mask, purpose):
         """Create IP pool
@@ -521,14 +1052,7 @@ class OSA:
 
         :returns: [[ip, if_id],..]
         """
-        con = uSysDB.connect()
-        cur = con.cursor()
-        cur.execute("""SELECT ip_address, if_id
-            FROM configured_ips
-            WHERE host_id = %s""",
-            (host_id,))
-        ip0_ifs = cur.fetchall()
-        con.close()
+        ip0_ifs = self.db.get_host_ips(host_id)
         # strip leading 0s from octets
         # 010 -> 10
         # 000 -> 0 !! The last zero should stay!
@@ -554,6 +1078,7 @@ class OSA:
         Reenterable
         :raises OSAError: if IP is not found
         """
+        from poaupdater.openapi import OpenAPIError
         if_id = self.find_ip_nic(host_id, if_ip)
         if not if_id:
             raise OSAError("Cannot find ip {0} on host, id: {1}"
@@ -582,11 +1107,12 @@ class OSA:
         return None
 
     def create_prov_brand(self, domain, exclusive_ip=False):
-        con = uSysDB.connect()
-        cur = con.cursor()
-        cur.execute("SELECT brand_id FROM brands WHERE brand_name='" + str(domain) + "'")
-        brand_id = cur.fetchall()
-        con.close()
+        """Create provider's brand on domain
+
+        Reenterable
+        :returns: brand id
+        """
+        brand_id = self.db.get_brand_id(domain)
         if brand_id:
             return brand_id
         else:
@@ -0,0 +1,112 @@
+import threading
+
+from errors import OSAError
+
+
+class Snapshot(object):
+    """State of OA objects loaded at once
+
+    Hosts, provisioning attributes, IP pools and brands are loaded with one
+    request each, resource types one request per class, domains are looked up
+    in one batch. Loaded hosts and resource types stay in OSA caches.
+    Used by Deployment.plan() to find out which steps are done already.
+    """
+
+    def __init__(self, osa, domains=(), rt_classes=(), workers=8, lazy=False):
+        """
+        :param domains: names of domains to look up
+        :param rt_classes: resource classes (names or friendly names) to load
+        :param lazy: load on the first lookup, e.g. when all steps may be found in Journal
+        """
+        self.osa = osa
+        self.domain_names = list(domains)
+        self.rt_classes = list(rt_classes)
+        self.workers = workers
+        self.domains = {}
+        self.attrs = set()
+        self.pools = {}
+        self.brands = {}
+        self.lock = threading.Lock()
+        self.loaded = False
+        if not lazy:
+            self.load()
+
+    def load(self):
+        """Load the state, only once
+
+        :raises OSAError: when some part failed to load
+        """
+        with self.lock:
+            if self.loaded:
+                return
+            loaders = [ self._load_hosts, self._load_attrs, self._load_pools,
+                self._load_brands, lambda: self._load_domains(self.domain_names) ]
+            loaders += [ (lambda rt_class=rt_class: self.osa.rts.load(rt_class))
+                for rt_class in self.rt_classes ]
+            done = self.osa.run_concurrently(lambda load: load(), loaders, self.workers)
+            errors = [ str(value) for ok, value in done if not ok ]
+            if errors:
+                raise OSAError("Failed to load snapshot: " + "; ".join(errors))
+            self.loaded = True
+
+    def _load_hosts(self):
+        self.osa.hosts.refresh()
+
+    def _load_attrs(self):
+        self.attrs = set(self.osa.get_attrs())
+
+    def _load_pools(self):
+        self.pools = self.osa.db.get_ip_pools()
+
+    def _load_brands(self):
+        self.brands = self.osa.db.get_brands()
+
+    def _load_domains(self, names):
+        self.domains = self.osa.get_domains(names)
+
+    def domain_id(self, name, owner_id=None):
+        """
+        :param owner_id: if set, domain of other owner is not counted
+        :returns: domain_id or None
+        """
+        self.load()
+        domain_id, domain_owner_id = self.domains.get(name, (None, None))
+        if owner_id is not None and domain_owner_id != owner_id:
+            return None
+        return domain_id
+
+    def host_id(self, ip):
+        """
+        :returns: host_id or None
+        """
+        self.load()
+        with self.osa.hosts.lock:
+            return self.osa.hosts.by_ip.get(ip)
+
+    def rt_id(self, rt_name, rt_class):
+        """
+        :returns: rt_id or None
+        """
+        self.load()
+        return self.osa.rts.get(rt_name, rt_class)
+
+    def has_attrs(self, *attrs):
+        """
+        :returns: True if all attributes exist, otherwise None
+        """
+        self.load()
+        return True if set(attrs) <= self.attrs else None
+
+    def pool_id(self, name):
+        """
+        :returns: pool_id or None
+        """
+        self.load()
+        return self.pools.get(name)
+
+    def brand_id(self, name):
+        """
+        :returns: brand_id or None
+        """
+        self.load()
+        return self.brands.get(name)
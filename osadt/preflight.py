@@ -0,0 +1,165 @@
+import time
+import errno
+import socket
+from multiprocessing.pool import ThreadPool
+
+from futures import FOREVER
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+
+class Preflight(object):
+    """Checks nodes before their registration
+
+    For every node, all at once:
+        backnet accepts connections to ssh_port,
+        SSH login with the given credentials succeeds,
+        frontnet is up (connection to frontnet_port is accepted or refused).
+    SSH login is checked with paramiko, if it is not installed only the SSH
+    banner is checked and the node gets a warning. Frontnet firewall may drop
+    connections to frontnet_port, so failed frontnet check is a warning too,
+    set frontnet_port to None to skip it.
+    Example:
+        preflight = Preflight('root', 'secret')
+        preflight.add('ns1', '10.0.0.1', '192.168.0.1')
+        failed = [ r for r in preflight.run() if r['errors'] ]
+    """
+
+    ssh_port = 22
+    frontnet_port = 22
+    timeout = 5
+    workers = 16
+
+    def __init__(self, login, password, timeout=None, workers=None):
+        """
+        :param login, password: SSH credentials of nodes
+        :param timeout: seconds to wait for every connection and login
+        """
+        self.login = login
+        self.password = password
+        if timeout is not None:
+            self.timeout = timeout
+        if workers is not None:
+            self.workers = workers
+        self.nodes = []
+
+    def add(self, name, backnet, frontnet=None, login=None, password=None):
+        """Add node to check
+
+        :param login, password: node specific SSH credentials
+        """
+        self.nodes.append({'name': name, 'backnet': backnet, 'frontnet': frontnet,
+            'login': login or self.login, 'password': password or self.password})
+
+    def run(self):
+        """Check all nodes
+
+        :returns: [{'name': .., 'backnet': .., 'frontnet': .., 'seconds': ..,
+            'ssh': 'ok' | 'banner' | 'failed', 'errors': [error, ..],
+            'warnings': [warning, ..]}, ..]
+            in the order nodes were added, errors are empty for good nodes
+        """
+        if not self.nodes:
+            return []
+        pool = ThreadPool(min(self.workers, len(self.nodes)))
+        try:
+            return pool.map_async(self.check, self.nodes, chunksize=1).get(FOREVER)
+        finally:
+            pool.close()
+            pool.join()
+
+    def check(self, node):
+        start = time.time()
+        result = {'name': node['name'], 'backnet': node['backnet'],
+            'frontnet': node['frontnet'], 'ssh': 'failed', 'errors': [], 'warnings': []}
+        error = self.connect(node['backnet'], self.ssh_port)
+        if error:
+            result['errors'].append("backnet {0}:{1}: {2}".format(
+                node['backnet'], self.ssh_port, error))
+        else:
+            error = self.check_ssh(node['backnet'], node['login'], node['password'])
+            if error:
+                result['errors'].append("SSH {0}@{1}: {2}".format(
+                    node['login'], node['backnet'], error))
+            elif paramiko:
+                result['ssh'] = 'ok'
+            else:
+                result['ssh'] = 'banner'
+                result['warnings'].append("SSH login is not checked, paramiko is not installed")
+        if (node['frontnet'] and node['frontnet'] != node['backnet'] and
+            self.frontnet_port is not None):
+            error = self.connect(node['frontnet'], self.frontnet_port, refused_ok=True)
+            if error:
+                result['warnings'].append("frontnet {0}:{1}: {2}".format(
+                    node['frontnet'], self.frontnet_port, error))
+        result['seconds'] = time.time() - start
+        return result
+
+    def connect(self, ip, port, refused_ok=False):
+        """
+        :param refused_ok: refused connection is fine, the host is up
+        :returns: None if connected, otherwise error description
+        """
+        try:
+            sock = socket.create_connection((ip, port), self.timeout)
+        except socket.timeout:
+            return "timeout ({0}s)".format(self.timeout)
+        except socket.error as err:
+            if refused_ok and err.errno == errno.ECONNREFUSED:
+                return None
+            return str(err)
+        sock.close()
+        return None
+
+    def check_ssh(self, ip, login, password):
+        """
+        :returns: None if login succeeded, otherwise error description
+        """
+        if paramiko is None:
+            return self._check_banner(ip)
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(ip, port=self.ssh_port, username=login, password=password,
+                timeout=self.timeout, banner_timeout=self.timeout, allow_agent=False,
+                look_for_keys=False)
+        except paramiko.AuthenticationException:
+            return "wrong login or password"
+        except Exception as err:
+            return str(err) or err.__class__.__name__
+        finally:
+            client.close()
+        return None
+
+    def _check_banner(self, ip):
+        try:
+            sock = socket.create_connection((ip, self.ssh_port), self.timeout)
+            try:
+                banner = sock.recv(256)
+            finally:
+                sock.close()
+        except socket.error as err:
+            return str(err)
+        if not banner.startswith('SSH-'):
+            return "not SSH server: {0!r}".format(banner[:40])
+        return None
+
+
+def format_results(results):
+    """
+    :returns: text table of Preflight.run() results
+    """
+    lines = []
+    for r in results:
+        if r['errors']:
+            status = '; '.join(r['errors'])
+        elif r['warnings']:
+            status = 'warning: ' + '; '.join(r['warnings'])
+        else:
+            status = 'ok'
+        lines.append("{0:<16} {1:<15} {2:<15} {3:<6} {4:>5.1f}s  {5}".format(r['name'],
+            r['backnet'], r['frontnet'] or '-', r['ssh'], r['seconds'], status))
+    return '\n'.join(lines)
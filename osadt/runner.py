@@ -0,0 +1,157 @@
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import subprocess
+
+from errors import OSAError
+from futures import Future
+import tracing
+
+log = logging.getLogger('osadt.cmd')
+
+
+class CommandRunner(object):
+    """Runs shell commands without a terminal
+
+    Output is streamed to the log line by line, the command is killed after
+    timeout and retried retries times retry_delay seconds apart. When all
+    attempts failed, on_failure tells what to do:
+        'abort' - raise OSAError
+        'ignore' - go on, run() returns False
+        'ask' - ask retry/abort/ignore if there is a terminal, abort otherwise
+    """
+
+    timeout = 3600
+    retries = 2
+    retry_delay = 30
+    on_failure = 'abort'
+
+    def __init__(self, timeout=None, retries=None, retry_delay=None, on_failure=None,
+        log=None, tracer=None):
+        """
+        :param log: callable(line) receiving command output, printed by default
+        :param tracer: tracing.Tracer recording commands, tracing.tracer by default
+        """
+        if timeout is not None:
+            self.timeout = timeout
+        if retries is not None:
+            self.retries = retries
+        if retry_delay is not None:
+            self.retry_delay = retry_delay
+        if on_failure is not None:
+            self.on_failure = on_failure
+        self.log = log or self._print
+        self.tracer = tracer or tracing.tracer
+        self.print_lock = threading.Lock()
+
+    def _print(self, line):
+        with self.print_lock:
+            print(line)
+
+    def run(self, cmd, name=None):
+        """Run shell command till it succeeds or attempts are over
+
+        :param name: what the command does, for log and errors
+        :returns: True on success, False if failure is ignored
+        :raises OSAError: on failure
+        """
+        name = name or cmd
+        attempt = 0
+        while True:
+            attempt += 1
+            error = self._run_once(cmd, name)
+            if error is None:
+                return True
+            self.log("{0}: {1}".format(name, error))
+            log.warning("%s failed: %s", name, error, extra={'command': name, 'outcome': error})
+            if attempt <= self.retries:
+                self.log("{0}: retrying in {1}s, attempt {2} of {3}".format(
+                    name, self.retry_delay, attempt + 1, self.retries + 1))
+                time.sleep(self.retry_delay)
+                continue
+            action = self.on_failure
+            if action == 'ask':
+                action = self._ask(name)
+            if action == 'retry':
+                attempt = 0
+            elif action == 'ignore':
+                return False
+            else:
+                raise OSAError("{0}: {1}".format(name, error))
+
+    def run_background(self, cmd, name=None):
+        """Run shell command in background, see run()
+
+        :returns: Future
+        """
+        future = Future(name or cmd)
+        def run():
+            try:
+                future.set_result(self.run(cmd, name))
+            except Exception as err:
+                future.set_exception(err)
+        thread = threading.Thread(target=run, name='CommandRunner')
+        thread.daemon = True
+        thread.start()
+        return future
+
+    def _ask(self, name):
+        if not sys.stdin.isatty():
+            return 'abort'
+        check = ""
+        with self.print_lock:
+            while check not in ('retry', 'abort', 'ignore'):
+                check = raw_input("{0} failed, retry/abort/ignore: ".format(name))
+        return check
+
+    def _run_once(self, cmd, name):
+        """Run command and record it in trace, failures are recorded as errors
+
+        :returns: None on success, otherwise error description
+        """
+        start = time.time()
+        args = {}
+        try:
+            error = self._execute(cmd, name, args)
+        except Exception as err:
+            self.tracer.record('cmd', cmd, start,
+                outcome="{0}: {1}".format(type(err).__name__, err), args=args)
+            raise
+        self.tracer.record('cmd', cmd, start, outcome=error or 'ok', args=args)
+        return error
+
+    def _execute(self, cmd, name, args):
+        """
+        :param args: details of the run for trace, filled in
+        :returns: None on success, otherwise error description
+        """
+        # own process group, so the whole shell pipeline can be killed
+        proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, preexec_fn=os.setsid)
+        reader = threading.Thread(target=self._stream, args=(proc.stdout, name))
+        reader.daemon = True
+        reader.start()
+        deadline = time.time() + self.timeout
+        while proc.poll() is None:
+            if time.time() > deadline:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+                reader.join()
+                args['timeout'] = True
+                return "timeout ({0}s)".format(self.timeout)
+            time.sleep(0.1)
+        reader.join()
+        args['returncode'] = proc.returncode
+        if proc.returncode != 0:
+            return "exit code {0}".format(proc.returncode)
+        return None
+
+    def _stream(self, output, name):
+        for line in iter(output.readline, ''):
+            line = line.rstrip('\n')
+            log.info(line, extra={'command': name})
+            self.log("{0}: {1}".format(name, line))
+        output.close()
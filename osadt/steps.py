@@ -0,0 +1,211 @@
+import time
+import Queue
+import logging
+from multiprocessing.pool import ThreadPool
+
+from errors import OSAError
+from futures import FOREVER
+
+log = logging.getLogger('osadt.steps')
+
+
+class Step(object):
+    """Deployment step
+
+    Result of the step is available to other steps under its name.
+    """
+
+    def __init__(self, name, func, args=(), kwargs=None, requires=(), after=(), exists=None,
+        journal=True, title=None):
+        """
+        :param func: callable which does the job
+        :param args: positional arguments for func
+        :param kwargs: keyword arguments for func
+        :param requires: results of which steps are passed to func as keyword arguments,
+            either [step_name, ..] or {argument_name: step_name, ..}
+        :param after: names of steps which have to be finished before, results are not passed
+        :param exists: callable returning the result if the job is done already, otherwise None,
+            e.g. lambda: snapshot.domain_id('prov.tld'), see Deployment.plan()
+        :param journal: record in Deployment journal, False to run the step every time
+        :param title: printed when the step is started, e.g. "Creating provider's domain"
+        """
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        if isinstance(requires, dict):
+            self.requires = dict(requires)
+        else:
+            self.requires = dict( (name, name) for name in requires )
+        self.after = set(after)
+        self.exists = exists
+        self.journal = journal
+        self.title = title
+
+    @property
+    def depends(self):
+        """Names of all steps this one waits for"""
+        return self.after | set(self.requires.values())
+
+    def run(self, results):
+        kwargs = dict(self.kwargs)
+        for arg, step_name in self.requires.items():
+            kwargs[arg] = results[step_name]
+        return self.func(*self.args, **kwargs)
+
+
+class Deployment(object):
+    """Set of deployment steps run concurrently in dependency order
+
+    Example:
+        deploy = Deployment()
+        deploy.add('domain_id', osa.add_provider_domain, ('prov.tld',))
+        deploy.add('dns_rt_id', osa.create_dns_rt, ('ns1.prov.tld', 'ns2.prov.tld'))
+        deploy.add('dns_hosting', osa.add_dns_hosting, ('prov.tld',),
+            requires=['dns_rt_id'], after=['domain_id'])
+        results = deploy.run()
+    """
+
+    workers = 8
+
+    def __init__(self, workers=None, journal=None):
+        """
+        :param journal: Journal recording finished steps, steps found there are done
+        """
+        self.workers = workers or self.workers
+        self.journal = journal
+        self.steps = {}
+        self.order = []
+
+    def add(self, name, func, args=(), kwargs=None, requires=(), after=(), exists=None,
+        journal=True, title=None):
+        """Add step, see Step
+
+        :returns: Step
+        :raises OSAError: if step with such name exists
+        """
+        if name in self.steps:
+            raise OSAError("Step {0} is already added".format(name))
+        step = Step(name, func, args, kwargs, requires, after, exists, journal, title)
+        self.steps[name] = step
+        self.order.append(name)
+        return step
+
+    def check(self):
+        """Check that all dependencies are known and there are no cycles
+
+        :raises OSAError: otherwise
+        """
+        for name in self.order:
+            unknown = self.steps[name].depends - set(self.steps)
+            if unknown:
+                raise OSAError("Step {0} depends on unknown steps: {1}"
+                    .format(name, ', '.join(sorted(unknown))))
+        done = set()
+        pending = list(self.order)
+        while pending:
+            ready = [ name for name in pending if self.steps[name].depends <= done ]
+            if not ready:
+                raise OSAError("Steps have circular dependencies: {0}"
+                    .format(', '.join(pending)))
+            done.update(ready)
+            pending = [ name for name in pending if name not in done ]
+
+    def plan(self):
+        """Find out which steps are done already
+
+        Step is done if it is in the journal and all steps it depends on are done,
+        or if its exists() returns the result, e.g. from a Snapshot.
+        Results of done steps are passed to the steps to run which require them.
+        :returns: ({step_name: result, ..} of done steps, [step_name, ..] of steps to run)
+        """
+        self.check()
+        journaled = self.journal.load() if self.journal else {}
+        done = {}
+        todo = []
+        for name in self.order:
+            step = self.steps[name]
+            # steps kept out of the journal are run every time without changing the result
+            if name in journaled and all( dep in done or not self.steps[dep].journal
+                for dep in step.depends ):
+                done[name] = journaled[name]
+                continue
+            result = None
+            if step.exists is not None:
+                result = step.exists()
+            if result is None:
+                todo.append(name)
+            else:
+                done[name] = result
+        return done, todo
+
+    def run(self, skip_done=False):
+        """Run all steps
+
+        Step is started as soon as all its dependencies are finished.
+        When a step fails, steps depending on it are skipped, independent ones go on.
+        :param skip_done: do not run steps which are done already, see plan()
+        :returns: {step_name: result, ..}
+        :raises OSAError: when some steps failed, after the rest are finished
+        """
+        self.check()
+        results = {}
+        pending = list(self.order)
+        if skip_done:
+            results, pending = self.plan()
+        errors = []
+        skipped = []
+        # name: start time
+        running = {}
+        finished = Queue.Queue()
+        pool = ThreadPool(self.workers)
+        try:
+            while pending or running:
+                failed = set(skipped) | set(name for name, err in errors)
+                for name in list(pending):
+                    depends = self.steps[name].depends
+                    if depends & failed:
+                        pending.remove(name)
+                        skipped.append(name)
+                        failed.add(name)
+                        log.warning("Step %s skipped", name, extra={'step': name,
+                            'outcome': 'skipped'})
+                    elif depends <= set(results):
+                        pending.remove(name)
+                        running[name] = time.time()
+                        log.info("Step %s started", name, extra={'step': name})
+                        if self.steps[name].title:
+                            print(self.steps[name].title)
+                        pool.apply_async(self._run_step, (self.steps[name], dict(results), finished))
+                if not running:
+                    continue
+                name, ok, value = finished.get(timeout=FOREVER)
+                duration = time.time() - running.pop(name)
+                if ok:
+                    log.info("Step %s finished", name, extra={'step': name, 'duration': duration,
+                        'outcome': 'ok'})
+                    results[name] = value
+                    if self.journal and self.steps[name].journal:
+                        self.journal.record(name, value)
+                else:
+                    log.error("Step %s failed: %s", name, value, extra={'step': name,
+                        'duration': duration, 'outcome': str(value)})
+                    errors.append((name, value))
+        except BaseException:
+            # e.g. Ctrl-C, do not wait for running steps
+            pool.terminate()
+            raise
+        pool.close()
+        pool.join()
+        if errors:
+            raise OSAError("Failed steps: {0}; skipped steps: {1}".format(
+                "; ".join("{0}: {1}".format(name, err) for name, err in errors),
+                ', '.join(skipped) or 'none'))
+        return results
+
+    @staticmethod
+    def _run_step(step, results, finished):
+        try:
+            finished.put((step.name, True, step.run(results)))
+        except Exception as err:
+            finished.put((step.name, False, err))
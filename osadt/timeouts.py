@@ -0,0 +1,131 @@
+import os
+import json
+import math
+import threading
+
+
+def percentile(values, p):
+    """
+    :param p: 0..100
+    :returns: nearest-rank percentile of values
+    """
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, int(math.ceil(p / 100.0 * len(values))) - 1))
+    return values[index]
+
+
+class AdaptiveTimeouts(object):
+    """Timeouts and poll cadence of OpenAPI requests learned from their durations
+
+    Durations of finished requests are kept per method and arguments of
+    key_args, by default per method and host_id and per method; the last
+    samples of each are saved to the file between runs. Once there are
+    min_samples of them:
+        timeout = margin * p95 duration, within [min_factor * default, default]
+        first check after the median duration
+    The most specific samples are used first. A timed out request drops the
+    samples, so the default is used till there are enough new ones; hung
+    requests never make the timeout longer than the default.
+    overrides {method: seconds} win over everything.
+    """
+
+    samples = 200
+    min_samples = 5
+    margin = 3
+    min_factor = 0.25
+    # {method: [arguments of a key, ..]}, the most specific first
+    key_args = {
+        'pem.registerSharedNode': [('host',), ()],
+        # durations of packages differ too much to share samples
+        'pem.packaging.installPackageSync': [('package_id', 'host_id'), ('package_id',)],
+    }
+    default_key_args = [('host_id',), ()]
+
+    def __init__(self, path=None, overrides=None, enabled=True):
+        """
+        :param path: file to load durations from and save them to, kept in memory only if None
+        :param enabled: if False, durations are recorded, but defaults are used
+        """
+        self.path = path
+        self.enabled = enabled
+        self.overrides = dict(overrides or {})
+        self.lock = threading.Lock()
+        self.durations = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                try:
+                    self.durations = json.load(f)
+                except ValueError:
+                    pass  # broken file is started over
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with self.lock:
+            data = json.dumps(self.durations)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.rename(tmp, self.path)
+
+    def _keys(self, methodname, kwargs):
+        """
+        :returns: keys of samples, the most specific first,
+            keys with arguments missing in kwargs are skipped
+        """
+        keys = []
+        for args in self.key_args.get(methodname, self.default_key_args):
+            if any(kwargs.get(arg) is None for arg in args):
+                continue
+            keys.append(' '.join([methodname] +
+                [ '{0}={1}'.format(arg, kwargs[arg]) for arg in args ]))
+        return keys
+
+    def _samples(self, methodname, kwargs):
+        if not self.enabled:
+            return None
+        with self.lock:
+            for key in self._keys(methodname, kwargs):
+                samples = self.durations.get(key, [])
+                if len(samples) >= self.min_samples:
+                    return list(samples)
+        return None
+
+    def record(self, methodname, kwargs, seconds):
+        """Record duration of successfully finished request"""
+        with self.lock:
+            for key in self._keys(methodname, kwargs):
+                samples = self.durations.setdefault(key, [])
+                samples.append(round(seconds, 3))
+                del samples[:-self.samples]
+
+    def timed_out(self, methodname, kwargs):
+        """Drop samples of the timed out request, they do not predict its duration"""
+        with self.lock:
+            for key in self._keys(methodname, kwargs):
+                self.durations.pop(key, None)
+
+    def timeout(self, methodname, kwargs, default):
+        """
+        :param default: timeout used till there are enough samples, the longest one
+        :returns: timeout for the request in seconds
+        """
+        if methodname in self.overrides:
+            return self.overrides[methodname]
+        samples = self._samples(methodname, kwargs)
+        if samples is None:
+            return default
+        return min(max(self.margin * percentile(samples, 95), self.min_factor * default),
+            default)
+
+    def first_check(self, methodname, kwargs, default, check_period):
+        """
+        :returns: seconds till the first status check of the request
+        """
+        samples = self._samples(methodname, kwargs)
+        if samples is None:
+            return default
+        return min(max(percentile(samples, 50), default), check_period)
@@ -0,0 +1,121 @@
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+log = logging.getLogger('osadt.trace')
+
+
+class Tracer(object):
+    """Records timing of API calls, database queries and commands
+
+    Every event has kind (api, request, db, cmd), name (e.g. pem method),
+    start and end time, outcome (ok or error text) and optional args.
+    """
+
+    # upper bounds of histogram buckets, seconds
+    buckets = (0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.started = time.time()
+
+    def record(self, kind, name, start, end=None, outcome='ok', tid=None, args=None):
+        """Record event
+
+        :param tid: lane of the event in Chrome trace, current thread by default
+        :param args: {name: value, ..} details of the event
+        """
+        event = {'kind': kind, 'name': name, 'start': start, 'end': end or time.time(),
+            'outcome': outcome, 'tid': tid or threading.current_thread().name,
+            'args': args or {}}
+        with self.lock:
+            self.events.append(event)
+        if log.isEnabledFor(logging.DEBUG):
+            extra = dict( (name, value) for name, value in event['args'].items()
+                if name in ('request_id', 'host', 'host_id', 'domain_name') )
+            extra.update(kind=kind, method=name, duration=event['end'] - start, outcome=outcome)
+            log.debug("%s %s %s", kind, name, outcome, extra=extra)
+        return event
+
+    @contextmanager
+    def span(self, kind, name, args=None):
+        """Record event around the block
+
+        Yields dict of args, which can be extended inside the block.
+        """
+        args = dict(args or {})
+        start = time.time()
+        try:
+            yield args
+        except Exception as err:
+            self.record(kind, name, start, outcome="{0}: {1}".format(type(err).__name__, err),
+                args=args)
+            raise
+        self.record(kind, name, start, args=args)
+
+    def summary(self):
+        """
+        :returns: {(kind, name): {'count': .., 'errors': .., 'total': .., 'min': .., 'max': ..,
+            'histogram': [count per bucket, .., count above the last bucket]}, ..}
+        """
+        with self.lock:
+            events = list(self.events)
+        summary = {}
+        for event in events:
+            duration = event['end'] - event['start']
+            stat = summary.setdefault((event['kind'], event['name']), {'count': 0, 'errors': 0,
+                'total': 0.0, 'min': duration, 'max': duration,
+                'histogram': [0] * (len(self.buckets) + 1)})
+            stat['count'] += 1
+            stat['errors'] += event['outcome'] != 'ok'
+            stat['total'] += duration
+            stat['min'] = min(stat['min'], duration)
+            stat['max'] = max(stat['max'], duration)
+            bucket = len([ b for b in self.buckets if b < duration ])
+            stat['histogram'][bucket] += 1
+        return summary
+
+    def format_summary(self):
+        """Summary table sorted by total time"""
+        header = ["{0:<8} {1:<45} {2:>5} {3:>4} {4:>9} {5:>8} {6:>8}  {7}".format(
+            'kind', 'name', 'count', 'errs', 'total,s', 'mean,s', 'max,s',
+            ' '.join("<{0}".format(b) for b in self.buckets) + " more")]
+        stats = sorted(self.summary().items(), key=lambda item: -item[1]['total'])
+        return '\n'.join(header + [
+            "{0:<8} {1:<45} {2:>5} {3:>4} {4:>9.2f} {5:>8.2f} {6:>8.2f}  {7}".format(
+                kind, name, stat['count'], stat['errors'], stat['total'],
+                stat['total'] / stat['count'], stat['max'],
+                ' '.join(str(c) for c in stat['histogram']))
+            for (kind, name), stat in stats ])
+
+    def export_json(self, filename):
+        """Save events as JSON list"""
+        with self.lock:
+            events = list(self.events)
+        with open(filename, 'w') as f:
+            json.dump(events, f, indent=1, default=str)
+
+    def export_chrome_trace(self, filename):
+        """Save events in Chrome trace format, viewable in chrome://tracing or Perfetto"""
+        with self.lock:
+            events = list(self.events)
+        tids = {}
+        trace = []
+        for event in events:
+            tid = tids.setdefault(event['tid'], len(tids) + 1)
+            args = dict(event['args'], outcome=event['outcome'])
+            trace.append({'name': event['name'], 'cat': event['kind'], 'ph': 'X',
+                'ts': int((event['start'] - self.started) * 1e6),
+                'dur': int((event['end'] - event['start']) * 1e6),
+                'pid': 1, 'tid': tid, 'args': args})
+        trace += [ {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+            'args': {'name': str(name)}} for name, tid in tids.items() ]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': trace}, f, default=str)
+
+
+# used where no tracer is passed explicitly
+tracer = Tracer()
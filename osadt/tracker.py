@@ -0,0 +1,145 @@
+import time
+import logging
+import threading
+
+from errors import OSAError
+from futures import Future
+
+log = logging.getLogger('osadt.tracker')
+
+# arguments hidden in errors, the errors end up in trace and logs
+SECRET_ARGS = ('password',)
+
+
+def format_args(kwargs):
+    """
+    :returns: text of call arguments with values of SECRET_ARGS hidden
+    """
+    return str(dict( (name, '***' if name in SECRET_ARGS else value)
+        for name, value in kwargs.items() ))
+
+
+class TrackedRequest(object):
+    """OpenAPI request waited by RequestTracker"""
+
+    def __init__(self, request_id, methodname, kwargs, result, timeout, first_check,
+        interval=None):
+        self.request_id = request_id
+        self.methodname = methodname
+        self.kwargs = kwargs
+        self.result = result
+        self.timeout = timeout
+        self.start_time = time.time()
+        self.interval = interval or first_check
+        self.next_check = self.start_time + first_check
+        self.polls = 0
+        self.timed_out = False
+        self.future = Future("{0} with args {1}".format(methodname, format_args(kwargs)))
+
+
+class RequestTracker(object):
+    """Waits for many OpenAPI requests in one background thread
+
+    All requests due to be checked are polled together in one cycle.
+    Requests missing in the poll result, or all of them if the poll fails,
+    are checked again later till their timeout.
+    The first check is done first_check seconds after the request is submitted,
+    then the interval grows backoff times up to check_period, so short tasks
+    are noticed quickly and long ones do not flood the API.
+    """
+
+    first_check = 0.2
+    backoff = 2
+
+    def __init__(self, poll, check_period=5, on_finish=None):
+        """
+        :param poll: callable([request_id, ..]) returning {request_id: status, ..},
+            status is the pem.getRequestStatus response
+        :param check_period: max interval between checks of one request
+        :param on_finish: callable(TrackedRequest, error or None) called when request is finished
+        """
+        self.poll = poll
+        self.check_period = check_period
+        self.on_finish = on_finish
+        self.requests = {}
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def track(self, request_id, methodname, kwargs, result, timeout, first_check=None):
+        """Start waiting for request
+
+        :param result: response of the api call, set to the future on success
+        :param first_check: seconds till the first check, e.g. typical duration of the task,
+            first_check attribute by default; the checks after it are as usual
+        :returns: Future
+            raises OSAError in case of timeout or API call failure
+        """
+        interval = min(self.first_check, self.check_period)
+        request = TrackedRequest(request_id, methodname, kwargs, result, timeout,
+            min(first_check or interval, self.check_period), interval)
+        with self.cond:
+            self.requests[request_id] = request
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='RequestTracker')
+                self.thread.daemon = True
+                self.thread.start()
+            self.cond.notify()
+        return request.future
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    now = time.time()
+                    due = [ r for r in self.requests.values() if r.next_check <= now ]
+                    if due:
+                        break
+                    if self.requests:
+                        self.cond.wait(min(r.next_check for r in self.requests.values()) - now)
+                    else:
+                        self.cond.wait()
+            self._check(due)
+
+    def _check(self, requests):
+        try:
+            statuses = self.poll([ r.request_id for r in requests ])
+        except Exception as err:
+            # tasks go on in OA, do not fail them because of one failed check
+            log.warning("Check of %d requests failed: %s", len(requests), err)
+            statuses = {}
+        now = time.time()
+        for request in requests:
+            request.polls += 1
+            status = statuses.get(request.request_id)
+            if status is None:
+                pass
+            elif status['request_status'] == 0:
+                self._finish(request)
+                continue
+            elif status['request_status'] == 2:
+                self._finish(request, error=OSAError(
+                    "Failure while executing {0} with args {1}, status: {2}"
+                    .format(request.methodname, format_args(request.kwargs), status)))
+                continue
+            if now - request.start_time > request.timeout:
+                request.timed_out = True
+                self._finish(request, error=OSAError(
+                    "Timeout ({2}) while executing {0} with args {1}"
+                    .format(request.methodname, format_args(request.kwargs),
+                        request.timeout)))
+                continue
+            request.interval = min(request.interval * self.backoff, self.check_period)
+            request.next_check = now + request.interval
+
+    def _finish(self, request, error=None):
+        with self.cond:
+            self.requests.pop(request.request_id, None)
+        if self.on_finish is not None:
+            try:
+                self.on_finish(request, error)
+            except Exception:
+                pass  # must not leave the future unresolved
+        if error is None:
+            request.future.set_result(request.result)
+        else:
+            request.future.set_exception(error)
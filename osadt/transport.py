@@ -0,0 +1,66 @@
+import socket
+import xmlrpclib
+
+
+class _KeepAlive:
+    """Keeps one HTTP/1.1 connection open and sends small requests without delay
+
+    Calls through OSA are serialized, so one connection is enough.
+    """
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+        conn = self._base.make_connection(self, host)
+        conn.connect()
+        # request headers and body are sent in separate packets,
+        # Nagle's algorithm would hold the second one till the ack
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+
+class KeepAliveTransport(_KeepAlive, xmlrpclib.Transport):
+    _base = xmlrpclib.Transport
+
+
+class KeepAliveSafeTransport(_KeepAlive, xmlrpclib.SafeTransport):
+    _base = xmlrpclib.SafeTransport
+
+
+def install_keep_alive(server):
+    """Replace transport of xmlrpclib.ServerProxy with the keep-alive one"""
+    # ServerProxy has no public way to change transport after creation
+    old = server._ServerProxy__transport
+    if isinstance(old, KeepAliveTransport) or isinstance(old, KeepAliveSafeTransport):
+        return
+    cls = KeepAliveSafeTransport if isinstance(old, xmlrpclib.SafeTransport) else KeepAliveTransport
+    server._ServerProxy__transport = cls(use_datetime=getattr(old, '_use_datetime', 0))
+
+
+def multicall(server, calls):
+    """Run several calls in one HTTP request with system.multicall
+
+    :param calls: [(methodname, params), ..]
+    :returns: [raw response or xmlrpclib.Fault, ..],
+        None if server does not support system.multicall
+    """
+    batch = xmlrpclib.MultiCall(server)
+    for methodname, params in calls:
+        getattr(batch, methodname)(params)
+    try:
+        raw = batch().results
+    except (xmlrpclib.Fault, xmlrpclib.ProtocolError):
+        return None
+    # OpenAPI answers unknown methods with {'status': -1, ..} struct instead of fault,
+    # anything but a list of one result or fault per call means no multicall
+    if not isinstance(raw, list) or len(raw) != len(calls):
+        return None
+    results = []
+    for res in raw:
+        if isinstance(res, dict) and 'faultCode' in res:
+            results.append(xmlrpclib.Fault(res['faultCode'], res.get('faultString')))
+        elif isinstance(res, list) and len(res) == 1:
+            results.append(res[0])
+        else:
+            return None
+    return results
@@ -0,0 +1,91 @@
+"""Helpers of the tests
+
+Tests run against bench/mockapi.py with the fake poaupdater of the benchmark:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'bench', 'fake'), os.path.join(ROOT, 'bench'), ROOT]
+
+import poaupdater
+import mockapi
+
+
+def wait_for(condition, timeout=5):
+    """Wait till condition() is true
+
+    :returns: True, False in case of timeout
+    """
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class LogRecords(logging.Handler):
+    """Keeps records of the logger while used as context manager"""
+
+    def __init__(self, name='osadt'):
+        logging.Handler.__init__(self)
+        self.logger = logging.getLogger(name)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def messages(self):
+        return [ record.getMessage() for record in self.records ]
+
+    def __enter__(self):
+        self.level = self.logger.level
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.logger.removeHandler(self)
+        self.logger.setLevel(self.level)
+
+
+class TempDirTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='osadt-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+
+class MockOATestCase(TempDirTestCase):
+    """Runs mock of OA management node for every test"""
+
+    # arguments of mockapi.MockOA
+    mock_options = {}
+
+    def setUp(self):
+        TempDirTestCase.setUp(self)
+        self.backend = mockapi.MockOA(**self.mock_options)
+        self.server, url = mockapi.serve(self.backend)
+        os.environ['OSADT_BENCH_URL'] = url
+        poaupdater.backend = self.backend
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.backend.close()
+        TempDirTestCase.tearDown(self)
+
+    def make_osa(self, **kwargs):
+        from osadt import OSA
+        kwargs.setdefault('log_file', os.path.join(self.tmpdir, 'poaupdater.log'))
+        return OSA(**kwargs)
@@ -0,0 +1,95 @@
+import time
+import threading
+import unittest
+
+import support
+
+from osadt import DomainCache, OSAError
+
+
+class DomainCacheTest(unittest.TestCase):
+
+    def test_concurrent_lookups_share_one_call(self):
+        calls = []
+        release = threading.Event()
+
+        def get_domain(name):
+            calls.append(name)
+            release.wait(5)
+            return (1001, 1)
+        cache = DomainCache(get_domain)
+        results = []
+        threads = [ threading.Thread(target=lambda: results.append(cache.get('prov.tld')))
+            for i in range(5) ]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(support.wait_for(lambda: calls))
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, ['prov.tld'])
+        self.assertEqual(results, [(1001, 1)] * 5)
+
+    def test_failed_lookup_is_raised_to_all_waiters(self):
+        release = threading.Event()
+
+        def get_domain(name):
+            release.wait(5)
+            raise OSAError("down")
+        cache = DomainCache(get_domain)
+        errors = []
+
+        def get():
+            try:
+                cache.get('prov.tld')
+            except OSAError as err:
+                errors.append(err)
+        threads = [ threading.Thread(target=get) for i in range(3) ]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(support.wait_for(lambda: cache.pending))
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(cache.pending, {})
+
+    def test_missing_domain_is_kept_for_negative_ttl(self):
+        calls = []
+
+        def get_domain(name):
+            calls.append(name)
+            return (None, None)
+        cache = DomainCache(get_domain, negative_ttl=0.2)
+        self.assertEqual(cache.get('new.tld'), (None, None))
+        self.assertEqual(cache.get('new.tld'), (None, None))
+        self.assertEqual(len(calls), 1)
+        time.sleep(0.3)
+        cache.get('new.tld')
+        self.assertEqual(len(calls), 2)
+
+    def test_added_domain_replaces_missing_one(self):
+        cache = DomainCache(lambda name: (None, None))
+        cache.get('new.tld')
+        cache.add('new.tld', 1002, 1)
+        self.assertEqual(cache.get('new.tld'), (1002, 1))
+        cache.invalidate('new.tld')
+        self.assertEqual(cache.get('new.tld'), (None, None))
+
+    def test_get_many_looks_up_unknown_names_together(self):
+        batches = []
+
+        def get_domains(names):
+            batches.append(sorted(names))
+            return dict( (name, (1000 + len(name), 1)) for name in names )
+        cache = DomainCache(None, get_domains)
+        cache.add('a.tld', 1, 1)
+        self.assertEqual(cache.get_many(['a.tld', 'bb.tld', 'ccc.tld']),
+            {'a.tld': (1, 1), 'bb.tld': (1006, 1), 'ccc.tld': (1007, 1)})
+        cache.get_many(['bb.tld', 'ccc.tld'])
+        self.assertEqual(batches, [['bb.tld', 'ccc.tld']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import time
+import threading
+import unittest
+
+import support
+
+from osadt import Governor, TokenBucket
+from poaupdater.openapi import OpenAPIError
+
+
+class GovernorTest(unittest.TestCase):
+
+    def test_limit(self):
+        governor = Governor({'pem.registerSharedNode': 1})
+        governor.acquire('pem.registerSharedNode')
+        acquired = threading.Event()
+
+        def acquire():
+            governor.acquire('pem.registerSharedNode')
+            acquired.set()
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.2))
+        governor.release('pem.registerSharedNode')
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_default_limit(self):
+        governor = Governor({'*': 2})
+        governor.acquire('pem.a')
+        governor.acquire('pem.a')
+        governor.acquire('pem.b')
+        self.assertEqual(governor.running, {'pem.a': 2, 'pem.b': 1})
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(20, 2)
+        start = time.time()
+        for i in range(4):
+            bucket.take()
+        # 2 at once, then 20 per second
+        self.assertGreaterEqual(time.time() - start, 0.09)
+
+
+class OSAGovernorTest(support.MockOATestCase):
+
+    mock_options = {'task_time': 0.05, 'fail_rates': {'pem.uploadLicense': 1.0}}
+
+    def test_release_on_call_error(self):
+        osa = self.make_osa(api_limits={'pem.noSuchMethod': 1})
+        self.assertRaises(OpenAPIError, osa.api_async_call_future, 'pem.noSuchMethod')
+        self.assertEqual(osa.governor.running['pem.noSuchMethod'], 0)
+
+    def test_release_on_task_failure(self):
+        osa = self.make_osa(api_limits={'pem.uploadLicense': 1})
+        future = osa.api_async_call_future('pem.uploadLicense', license='')
+        self.assertEqual(osa.governor.running['pem.uploadLicense'], 1)
+        self.assertIsNotNone(future.exception(5))
+        self.assertTrue(support.wait_for(
+            lambda: osa.governor.running['pem.uploadLicense'] == 0))
+
+    def test_release_on_success(self):
+        osa = self.make_osa(api_limits={'pem.addDomainToAccount': 1})
+        for name in ('a.tld', 'b.tld'):
+            osa.api_async_call_wait('pem.addDomainToAccount', account_id=1, domain_name=name)
+        self.assertTrue(support.wait_for(
+            lambda: osa.governor.running['pem.addDomainToAccount'] == 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import threading
+import unittest
+import BaseHTTPServer
+
+import support
+
+from osadt import LicenseCache
+
+
+class LicenseServer(BaseHTTPServer.HTTPServer):
+    """Serves license with ETag, answers 304 to If-None-Match of the current one"""
+
+    license = '<license id="1"/>'
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), LicenseHandler)
+        self.requests = []
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://{0}:{1}/PA.xml'.format(*self.server_address)
+
+    @property
+    def etag(self):
+        return '"{0}"'.format(abs(hash(self.license)))
+
+
+class LicenseHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.getheader('If-None-Match'))
+        if self.headers.getheader('If-None-Match') == server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(server.license)))
+        self.end_headers()
+        self.wfile.write(server.license)
+
+    def log_message(self, *args):
+        pass
+
+
+class LicenseCacheTest(support.TempDirTestCase):
+
+    def setUp(self):
+        support.TempDirTestCase.setUp(self)
+        self.server = LicenseServer()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        support.TempDirTestCase.tearDown(self)
+
+    def test_fetch_is_conditional(self):
+        cache = LicenseCache(os.path.join(self.tmpdir, 'cache'))
+        self.assertEqual(cache.fetch(self.server.url), '<license id="1"/>')
+        self.assertEqual(cache.fetch(self.server.url), '<license id="1"/>')
+        self.assertEqual(self.server.requests, [None, self.server.etag])
+        self.server.license = '<license id="2"/>'
+        self.assertEqual(cache.fetch(self.server.url), '<license id="2"/>')
+
+    def test_cached_copy_survives_restart(self):
+        directory = os.path.join(self.tmpdir, 'cache')
+        LicenseCache(directory).fetch(self.server.url)
+        self.assertEqual(LicenseCache(directory).fetch(self.server.url), '<license id="1"/>')
+        self.assertEqual(self.server.requests[-1], self.server.etag)
+
+    def test_active(self):
+        cache = LicenseCache(os.path.join(self.tmpdir, 'cache'))
+        self.assertFalse(cache.is_active('a'))
+        cache.set_active('a')
+        self.assertTrue(cache.is_active('a'))
+        self.assertFalse(cache.is_active('b'))
+
+
+class UploadLicenseTest(support.MockOATestCase):
+
+    def test_same_license_is_uploaded_once(self):
+        path = os.path.join(self.tmpdir, 'license.xml')
+        with open(path, 'w') as f:
+            f.write('<license/>')
+        osa = self.make_osa()
+        cache_dir = os.path.join(self.tmpdir, 'cache')
+        self.assertTrue(osa.upload_license(filename=path, cache_dir=cache_dir))
+        self.assertFalse(osa.upload_license(filename=path, cache_dir=cache_dir))
+        with open(path, 'w') as f:
+            f.write('<license renewed="1"/>')
+        self.assertTrue(osa.upload_license(filename=path, cache_dir=cache_dir))
+        self.assertEqual(self.backend.calls['pem.uploadLicense'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import json
+import time
+import logging
+import unittest
+
+import support
+
+from osadt import Tracer
+from osadt.logs import setup_logging, stop_logging
+
+
+class JsonLogTest(support.TempDirTestCase):
+
+    def test_passwords_are_hidden(self):
+        path = os.path.join(self.tmpdir, 'osadt.log.jsonl')
+        handler = setup_logging(path)
+        try:
+            error = "Failed: {'login': 'root', 'password': 'secret'}"
+            logging.getLogger('osadt.steps').error("Step %s failed: %s", 'ns0_host_id', error,
+                extra={'step': 'ns0_host_id', 'outcome': error})
+            Tracer().record('request', 'pem.registerSharedNode', time.time(), outcome=error)
+        finally:
+            stop_logging(handler)
+        with open(path) as f:
+            text = f.read()
+        self.assertNotIn('secret', text)
+        entries = [ json.loads(line) for line in text.splitlines() ]
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['outcome'], "Failed: {'login': 'root', 'password': '***'}")
+        self.assertEqual(entries[1]['method'], 'pem.registerSharedNode')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import json
+import unittest
+
+import support
+
+from osadt import Onboarding
+from osadt.onboarding import read_entries
+
+
+class OnboardingTest(support.MockOATestCase):
+
+    # the parent domain is slow to add, subdomains added meanwhile would fail
+    mock_options = {'task_time': 0.05, 'latencies': {'pem.addDomainToAccount': 0.3}}
+
+    def setUp(self):
+        support.MockOATestCase.setUp(self)
+        self.results_file = os.path.join(self.tmpdir, 'domains.results')
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def results(self):
+        with open(self.results_file) as f:
+            return [ json.loads(line) for line in f ]
+
+    def onboard(self, path):
+        onboarding = Onboarding(self.make_osa(), self.results_file, workers=4)
+        return onboarding.run(read_entries(path))
+
+    def test_subdomain_waits_for_domain(self):
+        path = self.write('domains.csv', "domain,prefix,dns_hosting\n"
+            "prov.tld,,yes\nprov.tld,cp,no\nprov.tld,www,no\n")
+        self.assertEqual(self.onboard(path), {'done': 3, 'failed': 0, 'skipped': 0})
+        results = self.results()
+        self.assertEqual([ r['name'] for r in results ][0], 'prov.tld')
+        ids = dict( (r['name'], r['domain_id']) for r in results )
+        self.assertLess(ids['prov.tld'], ids['cp.prov.tld'])
+        self.assertEqual(self.backend.domains['cp.prov.tld']['domain_id'], ids['cp.prov.tld'])
+
+    def test_subdomain_of_failed_domain_fails(self):
+        self.backend.domains['prov.tld'] = {'domain_id': 1001, 'owner_id': 2}
+        path = self.write('domains.csv', "domain,prefix\nprov.tld,\nprov.tld,cp\n")
+        self.assertEqual(self.onboard(path), {'done': 0, 'failed': 2, 'skipped': 0})
+        error = [ r['error'] for r in self.results() if r['name'] == 'cp.prov.tld' ][0]
+        self.assertTrue(error.startswith("Domain prov.tld failed: "), error)
+        self.assertEqual(self.backend.calls['pem.addSubdomain'], 0)
+
+    def test_repeated_run_skips_done_entries(self):
+        path = self.write('domains.jsonl', '{"domain": "prov.tld"}\n'
+            '{"domain": "prov.tld", "prefix": "cp"}\n')
+        self.assertEqual(self.onboard(path), {'done': 2, 'failed': 0, 'skipped': 0})
+        self.assertEqual(self.onboard(path), {'done': 0, 'failed': 0, 'skipped': 2})
+        # domain done in the previous run is not waited for
+        path = self.write('more.jsonl', '{"domain": "prov.tld", "prefix": "www"}\n')
+        self.assertEqual(self.onboard(path), {'done': 1, 'failed': 0, 'skipped': 0})
+
+    def test_duplicates_are_added_once(self):
+        path = self.write('domains.csv', "domain\nprov.tld\nprov.tld\n")
+        self.assertEqual(self.onboard(path), {'done': 2, 'failed': 0, 'skipped': 0})
+        self.assertEqual(len(set( r['domain_id'] for r in self.results() )), 1)
+        self.assertEqual(self.backend.calls['pem.addDomainToAccount'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import unittest
+
+import support
+import mockapi
+
+from osadt import Tracer
+
+
+class NoMulticall(mockapi._Dispatcher):
+    """OpenAPI answering system.multicall as an unknown method"""
+
+    def _dispatch(self, method, params):
+        return self.backend.dispatch(method, params[0] if params else {})
+
+
+class DomainLookupTest(support.MockOATestCase):
+
+    def setUp(self):
+        support.MockOATestCase.setUp(self)
+        self.backend.domains['prov.tld'] = {'domain_id': 1001, 'owner_id': 1}
+
+    def test_batch(self):
+        osa = self.make_osa(keep_alive=True)
+        self.assertEqual(osa.get_domains(['prov.tld', 'new.tld']),
+            {'prov.tld': (1001, 1), 'new.tld': (None, None)})
+        self.assertTrue(osa.multicall_supported)
+        self.assertEqual(self.backend.calls['system.multicall'], 1)
+        self.assertEqual(self.backend.calls['pem.getDomainByName'], 2)
+
+    def test_batch_without_multicall(self):
+        self.server.register_instance(NoMulticall(self.backend))
+        osa = self.make_osa(keep_alive=True)
+        self.assertEqual(osa.get_domains(['prov.tld', 'new.tld']),
+            {'prov.tld': (1001, 1), 'new.tld': (None, None)})
+        self.assertFalse(osa.multicall_supported)
+        osa.get_domains(['other.tld', 'more.tld'])
+        # rejected once, not tried again
+        self.assertEqual(self.backend.calls['system.multicall'], 1)
+        self.assertEqual(self.backend.calls['pem.getDomainByName'], 4)
+
+    def test_get_domain(self):
+        self.server.register_instance(NoMulticall(self.backend))
+        osa = self.make_osa()
+        self.assertEqual(osa.get_domain('prov.tld'), (1001, 1))
+        self.assertEqual(osa.add_provider_domain('prov.tld'), 1001)
+        self.assertEqual(osa.get_domain('new.tld'), (None, None))
+        self.assertEqual(self.backend.calls['system.multicall'], 0)
+
+    def test_add_domain_is_cached(self):
+        osa = self.make_osa()
+        domain_id = osa.add_provider_domain('new.tld')
+        lookups = self.backend.calls['pem.getDomainByName']
+        self.assertEqual(osa.get_domain('new.tld'), (domain_id, 1))
+        self.assertEqual(self.backend.calls['pem.getDomainByName'], lookups)
+
+
+class DNSRecordsTest(support.MockOATestCase):
+
+    def test_one_result_per_record(self):
+        self.backend.dns_records.add(('prov.tld', 'ns2', 'A', '10.0.0.2'))
+        osa = self.make_osa()
+        records = [('prov.tld', 'ns1', 'A', '10.0.0.1'), ('prov.tld', 'ns2', 'A', '10.0.0.2'),
+            {'domain': 'prov.tld', 'host': 'ns1', 'type': 'A', 'data': '10.0.0.1'}]
+        results = osa.add_dns_records(records)
+        self.assertEqual([ (r['host'], r['status']) for r in results ],
+            [('ns1', 'created'), ('ns2', 'exists'), ('ns1', 'created')])
+        self.assertEqual(results[0]['record_id'], results[2]['record_id'])
+        self.assertEqual(self.backend.calls['pem.createDNSRecord'], 2)
+
+
+class SecretsTest(support.MockOATestCase):
+
+    mock_options = {'task_time': 0.05, 'fail_rates': {'pem.registerSharedNode': 1.0}}
+
+    def test_password_is_not_traced(self):
+        tracer = Tracer()
+        osa = self.make_osa(tracer=tracer)
+        with self.assertRaises(Exception) as ctx:
+            osa.register_shared_node('10.0.0.1', 'root', 'secret')
+        self.assertNotIn('secret', str(ctx.exception))
+        self.assertIn("'password': '***'", str(ctx.exception))
+        self.assertNotIn('secret', json.dumps(tracer.events))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import time
+import unittest
+
+import support
+
+from osadt import CommandRunner, OSAError, Tracer
+
+
+class CommandRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lines = []
+        self.tracer = Tracer()
+
+    def runner(self, **kwargs):
+        return CommandRunner(log=self.lines.append, tracer=self.tracer, retry_delay=0, **kwargs)
+
+    def test_output_is_logged(self):
+        self.assertTrue(self.runner().run('echo one; echo two', 'greet'))
+        self.assertEqual(self.lines, ['greet: one', 'greet: two'])
+        stat = self.tracer.summary()[('cmd', 'echo one; echo two')]
+        self.assertEqual((stat['count'], stat['errors']), (1, 0))
+
+    def test_failure_is_retried_and_raised(self):
+        with self.assertRaises(OSAError) as ctx:
+            self.runner(retries=1).run('exit 3', 'fail')
+        self.assertEqual(str(ctx.exception), "fail: exit code 3")
+        stat = self.tracer.summary()[('cmd', 'exit 3')]
+        self.assertEqual((stat['count'], stat['errors']), (2, 2))
+        self.assertEqual(self.tracer.events[0]['outcome'], "exit code 3")
+
+    def test_ignored_failure(self):
+        self.assertFalse(self.runner(retries=0, on_failure='ignore').run('exit 1'))
+
+    def test_timeout_kills_command(self):
+        start = time.time()
+        runner = self.runner(timeout=0.3, retries=0, on_failure='ignore')
+        self.assertFalse(runner.run('sleep 5 | cat', 'slow'))
+        self.assertLess(time.time() - start, 3)
+        event, = self.tracer.events
+        self.assertEqual(event['outcome'], "timeout (0.3s)")
+        self.assertTrue(event['args']['timeout'])
+
+    def test_background(self):
+        future = self.runner().run_background('exit 2', 'bg')
+        self.assertIsInstance(future.exception(), OSAError)
+
+
+if __name__ == '__main__':
+    unittest.main()
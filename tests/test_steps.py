@@ -0,0 +1,111 @@
+import os
+import time
+import thread
+import threading
+import unittest
+
+import support
+
+from osadt import Deployment, Journal, OSAError
+
+
+def fail():
+    raise OSAError("broken")
+
+
+class DeploymentTest(unittest.TestCase):
+
+    def test_dependent_steps_are_skipped_after_failure(self):
+        calls = []
+        deploy = Deployment(workers=2)
+        deploy.add('a', fail)
+        deploy.add('b', calls.append, ('b',), after=['a'])
+        deploy.add('c', calls.append, ('c',), after=['b'])
+        deploy.add('d', calls.append, ('d',))
+        with self.assertRaises(OSAError) as ctx:
+            deploy.run()
+        self.assertEqual(calls, ['d'])
+        self.assertIn("a: broken", str(ctx.exception))
+        self.assertIn("skipped steps: b, c", str(ctx.exception))
+
+    def test_required_results_are_passed(self):
+        deploy = Deployment()
+        deploy.add('x', lambda: 2)
+        deploy.add('y', lambda x, n: x * n, kwargs={'n': 3}, requires=['x'])
+        deploy.add('z', lambda value: value + 1, requires={'value': 'y'})
+        self.assertEqual(deploy.run(), {'x': 2, 'y': 6, 'z': 7})
+
+    def test_circular_dependencies(self):
+        deploy = Deployment()
+        deploy.add('a', int, after=['b'])
+        deploy.add('b', int, after=['a'])
+        self.assertRaises(OSAError, deploy.check)
+
+    def test_interrupt_does_not_wait_for_running_steps(self):
+        deploy = Deployment()
+        deploy.add('slow', time.sleep, (3,))
+        threading.Timer(0.2, thread.interrupt_main).start()
+        start = time.time()
+        with self.assertRaises(KeyboardInterrupt):
+            deploy.run()
+        self.assertLess(time.time() - start, 2)
+
+    def test_done_steps_are_not_run(self):
+        calls = []
+        deploy = Deployment()
+        deploy.add('a', calls.append, ('a',), exists=lambda: 10)
+        deploy.add('b', lambda a: calls.append(a), requires=['a'])
+        deploy.run(skip_done=True)
+        self.assertEqual(calls, [10])
+
+
+class JournalTest(support.TempDirTestCase):
+
+    def make_deployment(self, fingerprint, calls):
+        journal = Journal(os.path.join(self.tmpdir, 'journal.jsonl'), fingerprint)
+        deploy = Deployment(journal=journal)
+
+        def step(name, value):
+            calls.append(name)
+            return value
+        deploy.add('license', step, ('license', True), journal=False)
+        deploy.add('domain_id', step, ('domain_id', 1001), after=['license'])
+        deploy.add('dns', lambda domain_id: step('dns', domain_id + 1), requires=['domain_id'])
+        return deploy
+
+    def test_resume(self):
+        calls = []
+        self.make_deployment('config1', calls).run(skip_done=True)
+        self.assertEqual(calls, ['license', 'domain_id', 'dns'])
+        calls = []
+        deploy = self.make_deployment('config1', calls)
+        self.assertEqual(deploy.plan(), ({'domain_id': 1001, 'dns': 1002}, ['license']))
+        results = deploy.run(skip_done=True)
+        # steps kept out of the journal are run every time
+        self.assertEqual(calls, ['license'])
+        self.assertEqual(results['domain_id'], 1001)
+
+    def test_changed_config_runs_all_steps(self):
+        self.make_deployment('config1', []).run(skip_done=True)
+        calls = []
+        self.make_deployment('config2', calls).run(skip_done=True)
+        self.assertEqual(calls, ['license', 'domain_id', 'dns'])
+
+    def test_failed_step_is_not_recorded(self):
+        journal = Journal(os.path.join(self.tmpdir, 'journal.jsonl'), 'config1')
+        deploy = Deployment(journal=journal)
+        deploy.add('a', lambda: 1)
+        deploy.add('b', fail)
+        self.assertRaises(OSAError, deploy.run)
+        self.assertEqual(journal.load(), {'a': 1})
+
+    def test_interrupted_line_is_ignored(self):
+        journal = Journal(os.path.join(self.tmpdir, 'journal.jsonl'), 'config1')
+        journal.record('a', 1)
+        with open(journal.path, 'a') as f:
+            f.write('{"step": "b", "res')
+        self.assertEqual(journal.load(), {'a': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
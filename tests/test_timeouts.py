@@ -0,0 +1,80 @@
+import os
+import unittest
+
+import support
+
+from osadt import AdaptiveTimeouts
+
+
+INSTALL = 'pem.packaging.installPackageSync'
+
+
+class AdaptiveTimeoutsTest(support.TempDirTestCase):
+
+    def record(self, timeouts, methodname, kwargs, seconds, count=5):
+        for i in range(count):
+            timeouts.record(methodname, kwargs, seconds)
+
+    def test_default_till_enough_samples(self):
+        timeouts = AdaptiveTimeouts()
+        self.record(timeouts, 'pem.addDomainToAccount', {}, 10, count=4)
+        self.assertEqual(timeouts.timeout('pem.addDomainToAccount', {}, 100), 100)
+        timeouts.record('pem.addDomainToAccount', {}, 10)
+        self.assertEqual(timeouts.timeout('pem.addDomainToAccount', {}, 100), 30)
+
+    def test_timeout_is_within_bounds(self):
+        timeouts = AdaptiveTimeouts()
+        self.record(timeouts, 'fast', {}, 1)
+        self.record(timeouts, 'slow', {}, 500)
+        self.assertEqual(timeouts.timeout('fast', {}, 300), 75)
+        self.assertEqual(timeouts.timeout('slow', {}, 300), 300)
+
+    def test_packages_are_kept_apart(self):
+        timeouts = AdaptiveTimeouts()
+        self.record(timeouts, INSTALL, {'host_id': 1, 'package_id': 10}, 20)
+        self.assertEqual(timeouts.timeout(INSTALL, {'host_id': 2, 'package_id': 10}, 1200), 300)
+        self.assertEqual(timeouts.timeout(INSTALL, {'host_id': 1, 'package_id': 11}, 1200), 1200)
+        self.record(timeouts, INSTALL, {'host_id': 1, 'package_id': 10}, 100)
+        self.assertEqual(timeouts.timeout(INSTALL, {'host_id': 1, 'package_id': 10}, 1200), 300)
+
+    def test_host_samples_are_used_first(self):
+        timeouts = AdaptiveTimeouts()
+        node = 'pem.registerSharedNode'
+        self.record(timeouts, node, {'host': '10.0.0.1'}, 100)
+        self.record(timeouts, node, {'host': '10.0.0.2'}, 200)
+        self.assertEqual(timeouts.timeout(node, {'host': '10.0.0.1'}, 1200), 300)
+        self.assertEqual(timeouts.timeout(node, {'host': '10.0.0.3'}, 1200), 600)
+
+    def test_timed_out_request_drops_samples(self):
+        timeouts = AdaptiveTimeouts()
+        self.record(timeouts, 'pem.addSubdomain', {}, 1)
+        timeouts.timed_out('pem.addSubdomain', {})
+        self.assertEqual(timeouts.timeout('pem.addSubdomain', {}, 300), 300)
+
+    def test_overrides_and_disabled(self):
+        timeouts = AdaptiveTimeouts(overrides={'pem.addSubdomain': 42}, enabled=False)
+        self.record(timeouts, 'pem.addDomainToAccount', {}, 1)
+        self.assertEqual(timeouts.timeout('pem.addSubdomain', {}, 300), 42)
+        self.assertEqual(timeouts.timeout('pem.addDomainToAccount', {}, 300), 300)
+
+    def test_first_check(self):
+        timeouts = AdaptiveTimeouts()
+        self.assertEqual(timeouts.first_check('pem.addSubdomain', {}, 1, 10), 1)
+        self.record(timeouts, 'pem.addSubdomain', {}, 4)
+        self.assertEqual(timeouts.first_check('pem.addSubdomain', {}, 1, 10), 4)
+        self.record(timeouts, 'pem.addSubdomain', {}, 60, count=10)
+        self.assertEqual(timeouts.first_check('pem.addSubdomain', {}, 1, 10), 10)
+
+    def test_samples_are_saved(self):
+        path = os.path.join(self.tmpdir, 'timeouts', 'durations.json')
+        timeouts = AdaptiveTimeouts(path)
+        self.record(timeouts, 'pem.addSubdomain', {}, 2)
+        timeouts.save()
+        self.assertEqual(AdaptiveTimeouts(path).timeout('pem.addSubdomain', {}, 300), 75)
+        with open(path, 'w') as f:
+            f.write('{"cut')
+        self.assertEqual(AdaptiveTimeouts(path).durations, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
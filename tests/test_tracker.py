@@ -0,0 +1,102 @@
+import unittest
+
+import support
+import mockapi
+
+from osadt import OSAError, RequestTracker
+
+
+class Statuses(object):
+    """Poll returning the next of the given results for every call"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self, request_ids):
+        self.calls += 1
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return dict( (request_id, {'request_status': result}) for request_id in request_ids )
+
+
+class RequestTrackerTest(unittest.TestCase):
+
+    def track(self, poll, timeout=5):
+        finished = []
+        tracker = RequestTracker(poll, check_period=0.05,
+            on_finish=lambda request, error: finished.append((request, error)))
+        future = tracker.track(1001, 'pem.addDomainToAccount', {'domain_name': 'prov.tld'},
+            {'domain_id': 1002}, timeout)
+        return future, finished
+
+    def test_done(self):
+        future, finished = self.track(Statuses(1, 1, 0))
+        self.assertEqual(future.result(5), {'domain_id': 1002})
+        self.assertEqual(finished[0][1], None)
+        self.assertEqual(finished[0][0].polls, 3)
+
+    def test_failure(self):
+        future, finished = self.track(Statuses(1, 2))
+        error = future.exception(5)
+        self.assertIsInstance(error, OSAError)
+        self.assertIn("Failure while executing pem.addDomainToAccount", str(error))
+        self.assertFalse(finished[0][0].timed_out)
+
+    def test_timeout(self):
+        future, finished = self.track(Statuses(1), timeout=0.2)
+        error = future.exception(5)
+        self.assertIn("Timeout (0.2)", str(error))
+        self.assertTrue(finished[0][0].timed_out)
+
+    def test_failed_poll_is_repeated(self):
+        poll = Statuses(IOError("connection reset"), 0)
+        future, finished = self.track(poll)
+        self.assertEqual(future.result(5), {'domain_id': 1002})
+        self.assertEqual(poll.calls, 2)
+
+    def test_failing_poll_times_out(self):
+        future, finished = self.track(Statuses(IOError("connection reset")), timeout=0.2)
+        self.assertIn("Timeout", str(future.exception(5)))
+
+    def test_missing_status_is_checked_again(self):
+        results = [{}, {1001: {'request_status': 0}}]
+        future, finished = self.track(lambda request_ids: results.pop(0))
+        self.assertEqual(future.result(5), {'domain_id': 1002})
+
+
+class OSAStatusTest(support.MockOATestCase):
+
+    def test_failed_status_checks_are_logged_once(self):
+        osa = self.make_osa()
+        request_id, result = osa.api_async_call('pem.addDomainToAccount', account_id=1,
+            domain_name='prov.tld')
+        with support.LogRecords('osadt.osa') as logs:
+            statuses = osa.api_request_statuses([request_id, 1, 2, 3])
+        self.assertEqual(list(statuses), [request_id])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("3 of 4 requests failed", logs.messages()[0])
+
+    def test_statuses_from_database(self):
+        osa = self.make_osa(poll_db=True, request_status_query=mockapi.REQUEST_STATUS_QUERY)
+        self.assertTrue(osa.add_provider_domain('prov.tld'))
+        self.assertEqual(self.backend.calls['pem.getRequestStatus'], 0)
+
+    def test_statuses_missing_in_database_are_polled(self):
+        query = "SELECT request_id, 0 FROM requests WHERE 0 AND request_id IN ({ids})"
+        osa = self.make_osa(poll_db=True, request_status_query=query)
+        with support.LogRecords('osadt.osa') as logs:
+            osa.add_provider_domain('prov.tld')
+            osa.add_provider_domain('new.tld')
+        self.assertTrue(osa.poll_db)
+        self.assertGreaterEqual(self.backend.calls['pem.getRequestStatus'], 2)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("returned no rows for 1 of 1 requests", logs.messages()[0])
+
+    def test_poll_db_requires_query(self):
+        self.assertRaises(OSAError, self.make_osa, poll_db=True)
+
+
+if __name__ == '__main__':
+    unittest.main()